@@ -56,3 +56,11 @@ def clear(skip_passphrase: bool = False):
         set_passphrase("")
     else:
         set_passphrase(None)
+
+
+def is_silent(msg) -> bool:
+    """
+    Return True if an address or public key request `msg` can be served
+    without any user interaction, see `wire.concurrent`.
+    """
+    return not msg.show_display and _cached_seed is not None
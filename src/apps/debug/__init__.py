@@ -4,12 +4,20 @@ if not __debug__:
     halt("debug mode inactive")
 
 if __debug__:
-    from trezor import loop
+    from trezor import loop, messages
     from trezor.messages import MessageType
     from trezor.messages.DebugLinkState import DebugLinkState
     from trezor.ui import confirm, swipe
     from trezor.wire import register, protobuf_workflow
     from apps.common import storage
+    from apps.debug.messages import (
+        DebugLinkGetLoopStats,
+        DebugLinkGetWireStats,
+        DebugLinkLoopStats,
+        DebugLinkTaskStats,
+        DebugLinkWireStats,
+        DebugLinkWireTypeStats,
+    )
 
     reset_internal_entropy = None
     reset_current_words = None
@@ -37,6 +45,50 @@ if __debug__:
             m.reset_word = " ".join(reset_current_words)
         return m
 
+    async def dispatch_DebugLinkGetLoopStats(ctx, msg):
+        # ring buffer starting with the oldest sample
+        pos = loop.queue_depth_pos
+        depth = loop.queue_depth_rb
+        m = DebugLinkLoopStats()
+        m.enabled = loop.profiling
+        m.poll_time = loop.poll_time
+        m.step_time = loop.step_time
+        m.queue_depth = list(depth[pos:]) + list(depth[:pos])
+        m.queue_depth_max = loop.queue_depth_max
+        for name, (steps, step_time, max_step_time) in loop.task_stats.items():
+            m.tasks.append(
+                DebugLinkTaskStats(
+                    name=name,
+                    steps=steps,
+                    step_time=step_time,
+                    max_step_time=max_step_time,
+                )
+            )
+        if msg.reset:
+            loop.reset_stats()
+        if msg.enable is not None:
+            loop.profile(msg.enable)
+        return m
+
+    async def dispatch_DebugLinkGetWireStats(ctx, msg):
+        from trezor.wire import stats
+
+        m = DebugLinkWireStats(bucket_base=stats.BUCKET_BASE_US)
+        for wire_type, counters in stats.stats.items():
+            m.types.append(
+                DebugLinkWireTypeStats(
+                    wire_type=wire_type,
+                    decode_time=list(counters[stats.DECODE : stats.HANDLER]),
+                    handler_time=list(counters[stats.HANDLER : stats.ENCODE]),
+                    encode_time=list(counters[stats.ENCODE : stats.BYTES_IN]),
+                    bytes_in=counters[stats.BYTES_IN],
+                    bytes_out=counters[stats.BYTES_OUT],
+                )
+            )
+        if msg.reset:
+            stats.reset()
+        return m
+
     def boot():
         # wipe storage when debug build is used
         storage.wipe()
@@ -47,3 +99,12 @@ if __debug__:
         register(
             MessageType.DebugLinkGetState, protobuf_workflow, dispatch_DebugLinkGetState
         )
+        register(
+            DebugLinkGetLoopStats, protobuf_workflow, dispatch_DebugLinkGetLoopStats
+        )
+        register(
+            DebugLinkGetWireStats, protobuf_workflow, dispatch_DebugLinkGetWireStats
+        )
+        # not in trezor.messages, see apps.debug.messages
+        messages.register(DebugLinkGetLoopStats)
+        messages.register(DebugLinkGetWireStats)
@@ -0,0 +1,123 @@
+"""
+DebugLink messages of the loop and wire stats, not defined in trezor-common yet.
+
+They are written in the pb2py style, but kept out of `trezor.messages`, which is
+regenerated from trezor-common.  The wire types come from the 0xF100 range of
+firmware-local messages, and the requests are registered with
+`trezor.messages.register` in `boot()`.
+"""
+
+import protobuf as p
+
+if __debug__:
+    try:
+        from typing import List
+    except ImportError:
+        List = None  # type: ignore
+
+
+class DebugLinkGetLoopStats(p.MessageType):
+    MESSAGE_WIRE_TYPE = 0xF100
+    FIELDS = {1: ("enable", p.BoolType, 0), 2: ("reset", p.BoolType, 0)}
+
+    def __init__(self, enable: bool = None, reset: bool = None) -> None:
+        self.enable = enable
+        self.reset = reset
+
+
+class DebugLinkTaskStats(p.MessageType):
+    FIELDS = {
+        1: ("name", p.UnicodeType, 0),
+        2: ("steps", p.UVarintType, 0),
+        3: ("step_time", p.UVarintType, 0),
+        4: ("max_step_time", p.UVarintType, 0),
+    }
+
+    def __init__(
+        self,
+        name: str = None,
+        steps: int = None,
+        step_time: int = None,
+        max_step_time: int = None,
+    ) -> None:
+        self.name = name
+        self.steps = steps
+        self.step_time = step_time
+        self.max_step_time = max_step_time
+
+
+class DebugLinkLoopStats(p.MessageType):
+    MESSAGE_WIRE_TYPE = 0xF101
+    FIELDS = {
+        1: ("enabled", p.BoolType, 0),
+        2: ("poll_time", p.UVarintType, 0),
+        3: ("step_time", p.UVarintType, 0),
+        4: ("queue_depth", p.UVarintType, p.FLAG_REPEATED),
+        5: ("queue_depth_max", p.UVarintType, 0),
+        6: ("tasks", DebugLinkTaskStats, p.FLAG_REPEATED),
+    }
+
+    def __init__(
+        self,
+        enabled: bool = None,
+        poll_time: int = None,
+        step_time: int = None,
+        queue_depth: List[int] = None,
+        queue_depth_max: int = None,
+        tasks: List[DebugLinkTaskStats] = None,
+    ) -> None:
+        self.enabled = enabled
+        self.poll_time = poll_time
+        self.step_time = step_time
+        self.queue_depth = queue_depth if queue_depth is not None else []
+        self.queue_depth_max = queue_depth_max
+        self.tasks = tasks if tasks is not None else []
+
+
+class DebugLinkGetWireStats(p.MessageType):
+    MESSAGE_WIRE_TYPE = 0xF102
+    FIELDS = {1: ("reset", p.BoolType, 0)}
+
+    def __init__(self, reset: bool = None) -> None:
+        self.reset = reset
+
+
+class DebugLinkWireTypeStats(p.MessageType):
+    FIELDS = {
+        1: ("wire_type", p.UVarintType, 0),
+        2: ("decode_time", p.UVarintType, p.FLAG_REPEATED),
+        3: ("handler_time", p.UVarintType, p.FLAG_REPEATED),
+        4: ("encode_time", p.UVarintType, p.FLAG_REPEATED),
+        5: ("bytes_in", p.UVarintType, 0),
+        6: ("bytes_out", p.UVarintType, 0),
+    }
+
+    def __init__(
+        self,
+        wire_type: int = None,
+        decode_time: List[int] = None,
+        handler_time: List[int] = None,
+        encode_time: List[int] = None,
+        bytes_in: int = None,
+        bytes_out: int = None,
+    ) -> None:
+        self.wire_type = wire_type
+        self.decode_time = decode_time if decode_time is not None else []
+        self.handler_time = handler_time if handler_time is not None else []
+        self.encode_time = encode_time if encode_time is not None else []
+        self.bytes_in = bytes_in
+        self.bytes_out = bytes_out
+
+
+class DebugLinkWireStats(p.MessageType):
+    MESSAGE_WIRE_TYPE = 0xF103
+    FIELDS = {
+        1: ("bucket_base", p.UVarintType, 0),
+        2: ("types", DebugLinkWireTypeStats, p.FLAG_REPEATED),
+    }
+
+    def __init__(
+        self, bucket_base: int = None, types: List[DebugLinkWireTypeStats] = None
+    ) -> None:
+        self.bucket_base = bucket_base
+        self.types = types if types is not None else []
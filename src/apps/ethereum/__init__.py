@@ -1,9 +1,13 @@
 from trezor import wire
 from trezor.messages import MessageType
 
+from apps.common import cache
+
 
 def boot():
     wire.add(MessageType.EthereumGetAddress, __name__, "get_address")
     wire.add(MessageType.EthereumSignTx, __name__, "sign_tx")
     wire.add(MessageType.EthereumSignMessage, __name__, "sign_message")
     wire.add(MessageType.EthereumVerifyMessage, __name__, "verify_message")
+    wire.limit(MessageType.EthereumTxAck, 2 * 1024)
+    wire.concurrent(MessageType.EthereumGetAddress, cache.is_silent)
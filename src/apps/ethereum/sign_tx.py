@@ -1,10 +1,12 @@
+import protobuf
 from trezor import wire
 from trezor.crypto import rlp
 from trezor.crypto.curve import secp256k1
 from trezor.crypto.hashlib import sha3_256
 from trezor.messages.EthereumSignTx import EthereumSignTx
 from trezor.messages.EthereumTxRequest import EthereumTxRequest
-from trezor.messages.MessageType import EthereumTxAck
+from trezor.messages import MessageType
+from trezor.messages.EthereumTxAck import EthereumTxAck
 from trezor.utils import HashWriter
 
 from apps.common import seed
@@ -15,6 +17,9 @@ from apps.ethereum.layout import (
     require_confirm_tx,
 )
 
+# data chunks are only hashed, keep them in the receive buffer
+protobuf.set_nocopy(EthereumTxAck, 1)
+
 # maximum supported chain id
 MAX_CHAIN_ID = 2147483629
 
@@ -124,7 +129,7 @@ async def send_request_chunk(ctx, data_left: int):
     else:
         req.data_length = 1024
 
-    return await ctx.call(req, EthereumTxAck)
+    return await ctx.call(req, MessageType.EthereumTxAck)
 
 
 async def send_signature(ctx, msg: EthereumSignTx, digest):
@@ -1,6 +1,5 @@
 import uctypes
 import ustruct
-import utime
 from micropython import const
 
 from trezor import io, log, loop, ui, utils, workflow
@@ -347,7 +346,7 @@ class ConfirmState:
     def compare(self, action: int, checksum: bytes) -> bool:
         if self.action != action or self.checksum != checksum:
             return False
-        if utime.ticks_ms() >= self.deadline:
+        if loop.ticks_ms() >= self.deadline:
             if self.workflow is not None:
                 loop.close(self.workflow)
             return False
@@ -367,7 +366,7 @@ class ConfirmState:
         return True
 
     def keepalive(self):
-        self.deadline = utime.ticks_ms() + _CONFIRM_TIMEOUT_MS
+        self.deadline = loop.ticks_ms() + _CONFIRM_TIMEOUT_MS
 
     async def confirm_workflow(self) -> None:
         try:
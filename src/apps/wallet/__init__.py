@@ -1,10 +1,15 @@
-from trezor import wire
+from trezor import messages, wire
 from trezor.messages import MessageType
 
+from apps.common import cache
+from apps.wallet.messages import GetAddresses, GetPublicKeys
+
 
 def boot():
     wire.add(MessageType.GetPublicKey, __name__, "get_public_key")
     wire.add(MessageType.GetAddress, __name__, "get_address")
+    wire.add(GetPublicKeys, __name__, "get_public_keys")
+    wire.add(GetAddresses, __name__, "get_addresses")
     wire.add(MessageType.GetEntropy, __name__, "get_entropy")
     wire.add(MessageType.SignTx, __name__, "sign_tx")
     wire.add(MessageType.SignMessage, __name__, "sign_message")
@@ -12,3 +17,11 @@ def boot():
     wire.add(MessageType.SignIdentity, __name__, "sign_identity")
     wire.add(MessageType.GetECDHSessionKey, __name__, "get_ecdh_session_key")
     wire.add(MessageType.CipherKeyValue, __name__, "cipher_key_value")
+    wire.limit(MessageType.TxAck, 8 * 1024)
+    wire.concurrent(MessageType.GetPublicKey, cache.is_silent)
+    wire.concurrent(MessageType.GetAddress, cache.is_silent)
+    wire.concurrent(GetPublicKeys, cache.is_silent)
+    wire.concurrent(GetAddresses, cache.is_silent)
+    # not in trezor.messages, see apps.wallet.messages
+    messages.register(GetPublicKeys)
+    messages.register(GetAddresses)
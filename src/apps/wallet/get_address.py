@@ -15,15 +15,17 @@ async def get_address(ctx, msg):
     address_short = addresses.address_short(coin, address)
 
     if msg.show_display:
-        while True:
-            if await show_address(ctx, address_short):
-                break
-            if await show_qr(
-                ctx,
-                address.upper()
-                if msg.script_type == InputScriptType.SPENDWITNESS
-                else address,
-            ):
-                break
+        await confirm_address(ctx, address, address_short, msg.script_type)
 
     return Address(address=address)
+
+
+async def confirm_address(ctx, address, address_short, script_type):
+    while True:
+        if await show_address(ctx, address_short):
+            break
+        if await show_qr(
+            ctx,
+            address.upper() if script_type == InputScriptType.SPENDWITNESS else address,
+        ):
+            break
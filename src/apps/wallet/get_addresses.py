@@ -0,0 +1,38 @@
+from micropython import const
+
+from trezor import wire
+from trezor.messages import InputScriptType
+
+from apps.common import coins, seed
+from apps.wallet.get_address import confirm_address
+from apps.wallet.messages import Addresses
+from apps.wallet.sign_tx import addresses
+
+_MAX_COUNT = const(64)  # maximum number of addresses in one response
+
+
+async def get_addresses(ctx, msg):
+    coin_name = msg.coin_name or "Bitcoin"
+    coin = coins.by_name(coin_name)
+    script_type = msg.script_type or InputScriptType.SPENDADDRESS
+    start = msg.start_index or 0
+    count = msg.count or 0
+    if not 0 < count <= _MAX_COUNT:
+        raise wire.DataError("Invalid count")
+    if start + count > 0x100000000:
+        raise wire.DataError("Invalid start_index")
+
+    # derive the parent node only once, the children are derived from it
+    parent = await seed.derive_node(ctx, msg.address_n, curve_name=coin.curve_name)
+
+    result = []
+    for index in range(start, start + count):
+        node = parent.clone()
+        node.derive(index)
+        address = addresses.get_address(script_type, coin, node)
+        if msg.show_display:
+            address_short = addresses.address_short(coin, address)
+            await confirm_address(ctx, address, address_short, script_type)
+        result.append(address)
+
+    return Addresses(addresses=result)
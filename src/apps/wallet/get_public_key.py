@@ -16,22 +16,7 @@ async def get_public_key(ctx, msg):
         curve_name = coin.curve_name
     node = await seed.derive_node(ctx, msg.address_n, curve_name=curve_name)
 
-    if script_type == InputScriptType.SPENDADDRESS and coin.xpub_magic is not None:
-        node_xpub = node.serialize_public(coin.xpub_magic)
-    elif (
-        coin.segwit
-        and script_type == InputScriptType.SPENDP2SHWITNESS
-        and coin.xpub_magic_segwit_p2sh is not None
-    ):
-        node_xpub = node.serialize_public(coin.xpub_magic_segwit_p2sh)
-    elif (
-        coin.segwit
-        and script_type == InputScriptType.SPENDWITNESS
-        and coin.xpub_magic_segwit_native is not None
-    ):
-        node_xpub = node.serialize_public(coin.xpub_magic_segwit_native)
-    else:
-        raise wire.DataError("Invalid combination of coin and script_type")
+    node_xpub = node.serialize_public(get_xpub_magic(coin, script_type))
 
     pubkey = node.public_key()
     if pubkey[0] == 1:
@@ -48,3 +33,22 @@ async def get_public_key(ctx, msg):
         await layout.show_pubkey(ctx, pubkey)
 
     return PublicKey(node=node_type, xpub=node_xpub)
+
+
+def get_xpub_magic(coin, script_type):
+    if script_type == InputScriptType.SPENDADDRESS and coin.xpub_magic is not None:
+        return coin.xpub_magic
+    elif (
+        coin.segwit
+        and script_type == InputScriptType.SPENDP2SHWITNESS
+        and coin.xpub_magic_segwit_p2sh is not None
+    ):
+        return coin.xpub_magic_segwit_p2sh
+    elif (
+        coin.segwit
+        and script_type == InputScriptType.SPENDWITNESS
+        and coin.xpub_magic_segwit_native is not None
+    ):
+        return coin.xpub_magic_segwit_native
+    else:
+        raise wire.DataError("Invalid combination of coin and script_type")
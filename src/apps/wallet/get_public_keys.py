@@ -0,0 +1,42 @@
+from micropython import const
+
+from trezor import wire
+from trezor.messages import InputScriptType
+
+from apps.common import coins, layout, seed
+from apps.wallet.get_public_key import get_xpub_magic
+from apps.wallet.messages import PublicKeys
+
+_MAX_COUNT = const(64)  # maximum number of public keys in one response
+
+
+async def get_public_keys(ctx, msg):
+    coin_name = msg.coin_name or "Bitcoin"
+    coin = coins.by_name(coin_name)
+    script_type = msg.script_type or InputScriptType.SPENDADDRESS
+    start = msg.start_index or 0
+    count = msg.count or 0
+    if not 0 < count <= _MAX_COUNT:
+        raise wire.DataError("Invalid count")
+    if start + count > 0x100000000:
+        raise wire.DataError("Invalid start_index")
+    xpub_magic = get_xpub_magic(coin, script_type)
+
+    curve_name = msg.ecdsa_curve_name
+    if not curve_name:
+        curve_name = coin.curve_name
+    # derive the parent node only once, the children are derived from it
+    parent = await seed.derive_node(ctx, msg.address_n, curve_name=curve_name)
+
+    xpubs = []
+    for index in range(start, start + count):
+        node = parent.clone()
+        node.derive(index)
+        if msg.show_display:
+            pubkey = node.public_key()
+            if pubkey[0] == 1:
+                pubkey = b"\x00" + pubkey[1:]
+            await layout.show_pubkey(ctx, pubkey)
+        xpubs.append(node.serialize_public(xpub_magic))
+
+    return PublicKeys(xpubs=xpubs)
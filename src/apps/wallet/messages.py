@@ -0,0 +1,91 @@
+"""
+Messages of the batch derivation workflows, not defined in trezor-common yet.
+
+They are written in the pb2py style, but kept out of `trezor.messages`, which is
+regenerated from trezor-common.  Until the messages are allocated upstream, the
+wire types come from the 0xF000 range used for firmware-local messages, and the
+requests are registered with `trezor.messages.register` in `boot()`.
+"""
+
+import protobuf as p
+
+if __debug__:
+    try:
+        from typing import List
+    except ImportError:
+        List = None  # type: ignore
+
+
+class GetAddresses(p.MessageType):
+    MESSAGE_WIRE_TYPE = 0xF000
+    FIELDS = {
+        1: ("address_n", p.UVarintType, p.FLAG_REPEATED),
+        2: ("coin_name", p.UnicodeType, 0),  # default=Bitcoin
+        3: ("show_display", p.BoolType, 0),
+        4: ("script_type", p.UVarintType, 0),  # default=SPENDADDRESS
+        5: ("start_index", p.UVarintType, 0),  # default=0
+        6: ("count", p.UVarintType, 0),  # required
+    }
+
+    def __init__(
+        self,
+        address_n: List[int] = None,
+        coin_name: str = None,
+        show_display: bool = None,
+        script_type: int = None,
+        start_index: int = None,
+        count: int = None,
+    ) -> None:
+        self.address_n = address_n if address_n is not None else []
+        self.coin_name = coin_name
+        self.show_display = show_display
+        self.script_type = script_type
+        self.start_index = start_index
+        self.count = count
+
+
+class Addresses(p.MessageType):
+    MESSAGE_WIRE_TYPE = 0xF001
+    FIELDS = {1: ("addresses", p.UnicodeType, p.FLAG_REPEATED)}
+
+    def __init__(self, addresses: List[str] = None) -> None:
+        self.addresses = addresses if addresses is not None else []
+
+
+class GetPublicKeys(p.MessageType):
+    MESSAGE_WIRE_TYPE = 0xF002
+    FIELDS = {
+        1: ("address_n", p.UVarintType, p.FLAG_REPEATED),
+        2: ("ecdsa_curve_name", p.UnicodeType, 0),
+        3: ("show_display", p.BoolType, 0),
+        4: ("coin_name", p.UnicodeType, 0),  # default=Bitcoin
+        5: ("script_type", p.UVarintType, 0),  # default=SPENDADDRESS
+        6: ("start_index", p.UVarintType, 0),  # default=0
+        7: ("count", p.UVarintType, 0),  # required
+    }
+
+    def __init__(
+        self,
+        address_n: List[int] = None,
+        ecdsa_curve_name: str = None,
+        show_display: bool = None,
+        coin_name: str = None,
+        script_type: int = None,
+        start_index: int = None,
+        count: int = None,
+    ) -> None:
+        self.address_n = address_n if address_n is not None else []
+        self.ecdsa_curve_name = ecdsa_curve_name
+        self.show_display = show_display
+        self.coin_name = coin_name
+        self.script_type = script_type
+        self.start_index = start_index
+        self.count = count
+
+
+class PublicKeys(p.MessageType):
+    MESSAGE_WIRE_TYPE = 0xF003
+    FIELDS = {1: ("xpubs", p.UnicodeType, p.FLAG_REPEATED)}
+
+    def __init__(self, xpubs: List[str] = None) -> None:
+        self.xpubs = xpubs if xpubs is not None else []
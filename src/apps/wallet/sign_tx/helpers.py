@@ -1,3 +1,4 @@
+import protobuf
 from trezor.messages import InputScriptType
 from trezor.messages.RequestType import (
     TXEXTRADATA,
@@ -15,6 +16,10 @@ from trezor.messages.TxRequest import TxRequest
 
 from apps.common.coininfo import CoinInfo
 
+# extra data of previous transactions is only hashed, keep it in the receive
+# buffer
+protobuf.set_nocopy(TransactionType, 8)
+
 # Machine instructions
 # ===
 
@@ -32,6 +32,7 @@ class Zip143:
         self.h_prevouts = HashWriter(blake2b, outlen=32, personal=b"ZcashPrevoutHash")
         self.h_sequence = HashWriter(blake2b, outlen=32, personal=b"ZcashSequencHash")
         self.h_outputs = HashWriter(blake2b, outlen=32, personal=b"ZcashOutputsHash")
+        self.prefix = None  # items 1 to 8 of the preimage
 
     def add_prevouts(self, txi: TxInputType):
         write_bytes_reversed(self.h_prevouts, txi.prev_hash)
@@ -52,6 +53,23 @@ class Zip143:
     def get_outputs_hash(self) -> bytes:
         return get_tx_hash(self.h_outputs)
 
+    def finalize(self, coin: CoinInfo, tx: SignTx):
+        """
+        Build the part of the preimage that is shared by all inputs.  Call
+        after all inputs and outputs were added, the digests are not updated
+        afterwards.
+        """
+        prefix = bytearray()
+        write_uint32(prefix, tx.version | OVERWINTERED)  # 1. nVersion | fOverwintered
+        write_uint32(prefix, coin.version_group_id)  # 2. nVersionGroupId
+        write_bytes(prefix, self.get_prevouts_hash())  # 3. hashPrevouts
+        write_bytes(prefix, self.get_sequence_hash())  # 4. hashSequence
+        write_bytes(prefix, self.get_outputs_hash())  # 5. hashOutputs
+        write_bytes(prefix, b"\x00" * 32)  # 6. hashJoinSplits
+        write_uint32(prefix, tx.lock_time)  # 7. nLockTime
+        write_uint32(prefix, tx.expiry)  # 8. expiryHeight
+        self.prefix = prefix
+
     def preimage_hash(
         self,
         coin: CoinInfo,
@@ -66,16 +84,10 @@ class Zip143:
 
         assert tx.overwintered
 
-        write_uint32(
-            h_preimage, tx.version | OVERWINTERED
-        )  # 1. nVersion | fOverwintered
-        write_uint32(h_preimage, coin.version_group_id)  # 2. nVersionGroupId
-        write_bytes(h_preimage, bytearray(self.get_prevouts_hash()))  # 3. hashPrevouts
-        write_bytes(h_preimage, bytearray(self.get_sequence_hash()))  # 4. hashSequence
-        write_bytes(h_preimage, bytearray(self.get_outputs_hash()))  # 5. hashOutputs
-        write_bytes(h_preimage, b"\x00" * 32)  # 6. hashJoinSplits
-        write_uint32(h_preimage, tx.lock_time)  # 7. nLockTime
-        write_uint32(h_preimage, tx.expiry)  # 8. expiryHeight
+        if self.prefix is None:
+            self.finalize(coin, tx)
+
+        write_bytes(h_preimage, self.prefix)  # 1. to 8.
         write_uint32(h_preimage, sighash)  # 9. nHashType
 
         write_bytes_reversed(h_preimage, txi.prev_hash)  # 10a. outpoint
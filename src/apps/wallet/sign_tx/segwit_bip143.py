@@ -28,6 +28,8 @@ class Bip143:
         self.h_prevouts = HashWriter(sha256)
         self.h_sequence = HashWriter(sha256)
         self.h_outputs = HashWriter(sha256)
+        self.prefix = None  # nVersion, hashPrevouts and hashSequence
+        self.suffix = None  # hashOutputs and nLockTime
 
     def add_prevouts(self, txi: TxInputType):
         write_bytes_reversed(self.h_prevouts, txi.prev_hash)
@@ -48,6 +50,22 @@ class Bip143:
     def get_outputs_hash(self, coin: CoinInfo) -> bytes:
         return get_tx_hash(self.h_outputs, double=coin.sign_hash_double)
 
+    def finalize(self, coin: CoinInfo, tx: SignTx):
+        """
+        Build the parts of the preimage that are shared by all inputs.  Call
+        after all inputs and outputs were added, the digests are not updated
+        afterwards.
+        """
+        prefix = bytearray()
+        write_uint32(prefix, tx.version)  # nVersion
+        write_bytes(prefix, self.get_prevouts_hash(coin))  # hashPrevouts
+        write_bytes(prefix, self.get_sequence_hash(coin))  # hashSequence
+        suffix = bytearray()
+        write_bytes(suffix, self.get_outputs_hash(coin))  # hashOutputs
+        write_uint32(suffix, tx.lock_time)  # nLockTime
+        self.prefix = prefix
+        self.suffix = suffix
+
     def preimage_hash(
         self,
         coin: CoinInfo,
@@ -60,9 +78,10 @@ class Bip143:
 
         assert not tx.overwintered
 
-        write_uint32(h_preimage, tx.version)  # nVersion
-        write_bytes(h_preimage, bytearray(self.get_prevouts_hash(coin)))  # hashPrevouts
-        write_bytes(h_preimage, bytearray(self.get_sequence_hash(coin)))  # hashSequence
+        if self.prefix is None:
+            self.finalize(coin, tx)
+
+        write_bytes(h_preimage, self.prefix)  # nVersion, hashPrevouts, hashSequence
 
         write_bytes_reversed(h_preimage, txi.prev_hash)  # outpoint
         write_uint32(h_preimage, txi.prev_index)  # outpoint
@@ -73,8 +92,7 @@ class Bip143:
 
         write_uint64(h_preimage, txi.amount)  # amount
         write_uint32(h_preimage, txi.sequence)  # nSequence
-        write_bytes(h_preimage, bytearray(self.get_outputs_hash(coin)))  # hashOutputs
-        write_uint32(h_preimage, tx.lock_time)  # nLockTime
+        write_bytes(h_preimage, self.suffix)  # hashOutputs, nLockTime
         write_uint32(h_preimage, sighash)  # nHashType
 
         return get_tx_hash(h_preimage, double=coin.sign_hash_double)
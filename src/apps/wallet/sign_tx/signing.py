@@ -1,5 +1,6 @@
 from micropython import const
 
+import protobuf
 from trezor.crypto import base58, bip32, cashaddr, der
 from trezor.crypto.curve import secp256k1
 from trezor.crypto.hashlib import sha256
@@ -35,6 +36,18 @@ _BIP32_CHANGE_CHAIN = const(1)
 # use and still allow to quickly brute-force the correct bip32 path
 _BIP32_MAX_LAST_ELEMENT = const(1000000)
 
+# the number of chain nodes kept by NodeCache
+_NODE_CACHE_SIZE = const(4)
+
+# the maximum size of inputs and outputs kept by TxCache, in bytes
+_TX_CACHE_SIZE = const(24 * 1024)
+
+# the maximum size of change outputs and scripts kept by ScriptCache, in bytes
+_SCRIPT_CACHE_SIZE = const(8 * 1024)
+
+# the size of a transaction hash
+_PREV_HASH_SIZE = const(32)
+
 
 class SigningError(ValueError):
     pass
@@ -64,6 +77,12 @@ async def check_tx_fee(tx: SignTx, root: bip32.HDNode):
     else:
         hash143 = Bip143()  # bip143 transaction hashing
 
+    if coin.force_bip143 or tx.overwintered:
+        tx_cache = None  # inputs are never signed the legacy way
+    else:
+        tx_cache = TxCache()  # inputs and outputs for legacy signing
+
+    scripts = ScriptCache(coin, root)  # output scripts reused in Phase 2
     multifp = MultisigFingerprint()  # control checksum of multisig inputs
     weight = TxWeightCalculator(tx.inputs_count, tx.outputs_count)
 
@@ -73,6 +92,8 @@ async def check_tx_fee(tx: SignTx, root: bip32.HDNode):
     change_out = 0  # change output amount
     wallet_path = []  # common prefix of input paths
     segwit = {}  # dict of booleans stating if input is segwit
+    prevouts = {}  # prev_hash -> {prev_index: count} of legacy inputs
+    prev_hashes = []  # keys of `prevouts` in the order of inputs
 
     # output structures
     txo_bin = TxOutputBinType()
@@ -85,6 +106,8 @@ async def check_tx_fee(tx: SignTx, root: bip32.HDNode):
         txi = await request_tx_input(tx_req, i)
         wallet_path = input_extract_wallet_path(txi, wallet_path)
         write_tx_input_check(h_first, txi)
+        if tx_cache is not None and not tx_cache.add_input(txi):
+            tx_cache = None  # does not fit, legacy inputs are signed by streaming
         weight.add_input(txi)
         hash143.add_prevouts(txi)  # all inputs are included (non-segwit as well)
         hash143.add_sequence(txi)
@@ -123,18 +146,29 @@ async def check_tx_fee(tx: SignTx, root: bip32.HDNode):
                 total_in += txi.amount
             else:
                 segwit[i] = False
-                total_in += await get_prevtx_output_value(
-                    coin, tx_req, txi.prev_hash, txi.prev_index
-                )
+                # previous transactions are verified after all inputs are known
+                prev_hash = bytes(txi.prev_hash)
+                prev_indexes = prevouts.get(prev_hash)
+                if prev_indexes is None:
+                    prev_indexes = prevouts[prev_hash] = {}
+                    prev_hashes.append(prev_hash)
+                prev_indexes[txi.prev_index] = prev_indexes.get(txi.prev_index, 0) + 1
 
         else:
             raise SigningError(FailureType.DataError, "Wrong input script type")
 
+    # every previous transaction is streamed and hashed only once, even if
+    # several inputs spend its outputs
+    for prev_hash in prev_hashes:
+        total_in += await get_prevtx_output_value(
+            coin, tx_req, prev_hash, prevouts[prev_hash]
+        )
+
     for o in range(tx.outputs_count):
         # STAGE_REQUEST_3_OUTPUT
         txo = await request_tx_output(tx_req, o)
         txo_bin.amount = txo.amount
-        txo_bin.script_pubkey = output_derive_script(txo, coin, root)
+        txo_bin.script_pubkey = scripts.derive(o, txo)
         weight.add_output(txo_bin.script_pubkey)
 
         if change_out == 0 and is_change(txo, wallet_path, segwit_in, multifp):
@@ -144,6 +178,8 @@ async def check_tx_fee(tx: SignTx, root: bip32.HDNode):
             raise SigningError(FailureType.ActionCancelled, "Output cancelled")
 
         write_tx_output(h_first, txo_bin)
+        if tx_cache is not None and not tx_cache.add_output(txo_bin):
+            tx_cache = None  # does not fit, legacy inputs are signed by streaming
         hash143.add_output(txo_bin)
         total_out += txo_bin.amount
 
@@ -159,7 +195,14 @@ async def check_tx_fee(tx: SignTx, root: bip32.HDNode):
     if not await confirm_total(total_in - change_out, fee, coin):
         raise SigningError(FailureType.ActionCancelled, "Total cancelled")
 
-    return h_first, hash143, segwit, total_in, wallet_path
+    # all inputs and outputs are known, digests of the segwit preimage are
+    # computed only once and reused for every input in Phase 2
+    hash143.finalize(coin, tx)
+
+    if False not in segwit.values():
+        tx_cache = None  # no legacy inputs to sign
+
+    return h_first, hash143, segwit, total_in, wallet_path, tx_cache, scripts
 
 
 async def sign_tx(tx: SignTx, root: bip32.HDNode):
@@ -169,7 +212,9 @@ async def sign_tx(tx: SignTx, root: bip32.HDNode):
 
     # Phase 1
 
-    h_first, hash143, segwit, authorized_in, wallet_path = await check_tx_fee(tx, root)
+    h_first, hash143, segwit, authorized_in, wallet_path, tx_cache, scripts = await check_tx_fee(
+        tx, root
+    )
 
     # Phase 2
     # - sign inputs
@@ -177,6 +222,7 @@ async def sign_tx(tx: SignTx, root: bip32.HDNode):
 
     coin = coins.by_name(tx.coin_name)
     tx_ser = TxRequestSerializedType()
+    keychain = NodeCache(root, wallet_path)
 
     txo_bin = TxOutputBinType()
     tx_req = TxRequest()
@@ -203,7 +249,7 @@ async def sign_tx(tx: SignTx, root: bip32.HDNode):
                 )
             input_check_wallet_path(txi_sign, wallet_path)
 
-            key_sign = node_derive(root, txi_sign.address_n)
+            key_sign = keychain.derive(txi_sign.address_n)
             key_sign_pub = key_sign.public_key()
             txi_sign.script_sig = input_derive_script(coin, txi_sign, key_sign_pub)
 
@@ -231,7 +277,7 @@ async def sign_tx(tx: SignTx, root: bip32.HDNode):
                 )
             authorized_in -= txi_sign.amount
 
-            key_sign = node_derive(root, txi_sign.address_n)
+            key_sign = keychain.derive(txi_sign.address_n)
             key_sign_pub = key_sign.public_key()
             hash143_hash = hash143.preimage_hash(
                 coin, tx, txi_sign, ecdsa_hash_pubkey(key_sign_pub), get_hash_type(coin)
@@ -276,13 +322,23 @@ async def sign_tx(tx: SignTx, root: bip32.HDNode):
             write_varint(h_sign, tx.inputs_count)
 
             for i in range(tx.inputs_count):
+                if tx_cache is not None and i != i_sign:
+                    # input confirmed in Phase 1, no need to stream it again
+                    tx_cache.write_input(h_sign, i)
+                    continue
                 # STAGE_REQUEST_4_INPUT
                 txi = await request_tx_input(tx_req, i)
                 input_check_wallet_path(txi, wallet_path)
-                write_tx_input_check(h_second, txi)
+                if tx_cache is None:
+                    write_tx_input_check(h_second, txi)
+                elif not tx_cache.check_input(i, txi):
+                    raise SigningError(
+                        FailureType.ProcessError,
+                        "Transaction has changed during signing",
+                    )
                 if i == i_sign:
                     txi_sign = txi
-                    key_sign = node_derive(root, txi.address_n)
+                    key_sign = keychain.derive(txi.address_n)
                     key_sign_pub = key_sign.public_key()
                     # for the signing process the script_sig is equal
                     # to the previous tx's scriptPubKey (P2PKH) or a redeem script (P2SH)
@@ -310,10 +366,14 @@ async def sign_tx(tx: SignTx, root: bip32.HDNode):
             write_varint(h_sign, tx.outputs_count)
 
             for o in range(tx.outputs_count):
+                if tx_cache is not None:
+                    # output confirmed in Phase 1, no need to stream it again
+                    write_bytes(h_sign, tx_cache.outputs[o])
+                    continue
                 # STAGE_REQUEST_4_OUTPUT
                 txo = await request_tx_output(tx_req, o)
                 txo_bin.amount = txo.amount
-                txo_bin.script_pubkey = output_derive_script(txo, coin, root)
+                txo_bin.script_pubkey = scripts.derive(o, txo)
                 write_tx_output(h_second, txo_bin)
                 write_tx_output(h_sign, txo_bin)
 
@@ -325,7 +385,7 @@ async def sign_tx(tx: SignTx, root: bip32.HDNode):
             write_uint32(h_sign, get_hash_type(coin))
 
             # check the control digests
-            if get_tx_hash(h_first, False) != get_tx_hash(h_second):
+            if tx_cache is None and get_tx_hash(h_first) != get_tx_hash(h_second):
                 raise SigningError(
                     FailureType.ProcessError, "Transaction has changed during signing"
                 )
@@ -360,7 +420,7 @@ async def sign_tx(tx: SignTx, root: bip32.HDNode):
         # STAGE_REQUEST_5_OUTPUT
         txo = await request_tx_output(tx_req, o)
         txo_bin.amount = txo.amount
-        txo_bin.script_pubkey = output_derive_script(txo, coin, root)
+        txo_bin.script_pubkey = scripts.derive(o, txo)
 
         # serialize output
         w_txo_bin = empty_bytearray(5 + 8 + 5 + len(txo_bin.script_pubkey) + 4)
@@ -393,7 +453,7 @@ async def sign_tx(tx: SignTx, root: bip32.HDNode):
                 )
             authorized_in -= txi.amount
 
-            key_sign = node_derive(root, txi.address_n)
+            key_sign = keychain.derive(txi.address_n)
             key_sign_pub = key_sign.public_key()
             hash143_hash = hash143.preimage_hash(
                 coin, tx, txi, ecdsa_hash_pubkey(key_sign_pub), get_hash_type(coin)
@@ -428,9 +488,9 @@ async def sign_tx(tx: SignTx, root: bip32.HDNode):
 
 
 async def get_prevtx_output_value(
-    coin: CoinInfo, tx_req: TxRequest, prev_hash: bytes, prev_index: int
+    coin: CoinInfo, tx_req: TxRequest, prev_hash: bytes, prev_indexes: dict
 ) -> int:
-    total_out = 0  # sum of output amounts
+    total_out = 0  # sum of spent output amounts, see `prev_indexes`
 
     # STAGE_REQUEST_2_PREV_META
     tx = await request_tx_meta(tx_req, prev_hash)
@@ -456,8 +516,9 @@ async def get_prevtx_output_value(
         # STAGE_REQUEST_2_PREV_OUTPUT
         txo_bin = await request_tx_output(tx_req, o, prev_hash)
         write_tx_output(txh, txo_bin)
-        if o == prev_index:
-            total_out += txo_bin.amount
+        if o in prev_indexes:
+            # counted once for every input spending the output
+            total_out += txo_bin.amount * prev_indexes[o]
 
     write_uint32(txh, tx.lock_time)
 
@@ -570,6 +631,43 @@ def output_derive_script(o: TxOutputType, coin: CoinInfo, root: bip32.HDNode) ->
     raise SigningError(FailureType.DataError, "Invalid address type")
 
 
+class ScriptCache:
+    """
+    Scripts of change outputs derived in Phase 1, by output index.  Only
+    outputs with `address_n` are cached, deriving their key is the expensive
+    part, scripts of other outputs are cheaper to build again than to check.
+    A script is reused only if the output streamed again is exactly the one
+    it was derived from, otherwise it is derived again.
+    """
+
+    def __init__(self, coin: CoinInfo, root: bip32.HDNode):
+        self.coin = coin
+        self.root = root
+        self.scripts = {}  # output index -> (serialized output, script_pubkey)
+        self.size = 0
+
+    def derive(self, i: int, o: TxOutputType) -> bytes:
+        if not o.address_n:
+            return output_derive_script(o, self.coin, self.root)
+
+        # serialize before deriving the script, it fills in change addresses
+        sizes = []
+        w = protobuf.BufferWriter(bytearray(protobuf.count_message(o, sizes)))
+        protobuf.encode_message(w, o, sizes)
+
+        cached = self.scripts.get(i)
+        if cached is not None and cached[0] == w.buf:
+            return cached[1]
+
+        script = output_derive_script(o, self.coin, self.root)
+        if cached is None:
+            size = self.size + len(w.buf) + len(script)
+            if size <= _SCRIPT_CACHE_SIZE:
+                self.scripts[i] = (w.buf, script)
+                self.size = size
+        return script
+
+
 def get_address_for_change(o: TxOutputType, coin: CoinInfo, root: bip32.HDNode):
     if o.script_type == OutputScriptType.PAYTOADDRESS:
         input_script_type = InputScriptType.SPENDADDRESS
@@ -672,6 +770,88 @@ def node_derive(root: bip32.HDNode, address_n: list) -> bip32.HDNode:
     return node
 
 
+class NodeCache:
+    """
+    Derives keys below the common account path of the inputs.  The account
+    node is derived only once and the last few chain nodes are kept, so in
+    the usual case only the address level is derived for every key.
+    """
+
+    def __init__(self, root: bip32.HDNode, wallet_path: list):
+        self.root = root
+        self.wallet_path = wallet_path
+        self.account = None
+        self.chains = []  # (chain, node), least recently used first
+
+    def derive(self, address_n: list) -> bip32.HDNode:
+        if not self.wallet_path or self.wallet_path != address_n[:-_BIP32_WALLET_DEPTH]:
+            return node_derive(self.root, address_n)
+        node = self.get_chain(address_n[-2]).clone()
+        node.derive(address_n[-1])
+        return node
+
+    def get_chain(self, chain: int) -> bip32.HDNode:
+        for item in self.chains:
+            if item[0] == chain:
+                self.chains.remove(item)
+                self.chains.append(item)
+                return item[1]
+        if self.account is None:
+            self.account = node_derive(self.root, self.wallet_path)
+        node = self.account.clone()
+        node.derive(chain)
+        if len(self.chains) >= _NODE_CACHE_SIZE:
+            self.chains.pop(0)
+        self.chains.append((chain, node))
+        return node
+
+
+class TxCache:
+    """
+    Inputs and outputs of the transaction as hashed into h_first in Phase 1,
+    so legacy inputs can be signed without streaming the whole transaction
+    again for every one of them.  The cache never leaves the device, only the
+    input being signed is streamed again and checked against it.
+    """
+
+    def __init__(self):
+        self.inputs = []  # serialized by write_tx_input_check
+        self.outputs = []  # serialized by write_tx_output
+        self.size = 0
+
+    def add_input(self, txi: TxInputType) -> bool:
+        if len(txi.prev_hash) != _PREV_HASH_SIZE:
+            return False  # write_input relies on the size
+        w = bytearray()
+        write_tx_input_check(w, txi)
+        return self.add(self.inputs, w)
+
+    def add_output(self, txo_bin: TxOutputBinType) -> bool:
+        w = bytearray()
+        write_tx_output(w, txo_bin)
+        return self.add(self.outputs, w)
+
+    def add(self, items: list, w: bytearray) -> bool:
+        self.size += len(w)
+        if self.size > _TX_CACHE_SIZE:
+            return False
+        items.append(w)
+        return True
+
+    def check_input(self, i: int, txi: TxInputType) -> bool:
+        w = bytearray()
+        write_tx_input_check(w, txi)
+        return w == self.inputs[i]
+
+    def write_input(self, w, i: int):
+        # input with an empty script_sig, as written by write_tx_input
+        txi = self.inputs[i]
+        write_bytes_reversed(w, txi[:_PREV_HASH_SIZE])  # prev_hash
+        write_bytes(w, txi[_PREV_HASH_SIZE : _PREV_HASH_SIZE + 4])  # prev_index
+        write_varint(w, 0)  # script_sig
+        write_bytes(w, txi[-8:-4])  # sequence
+
+
 def address_n_matches_coin(address_n: list, coin: CoinInfo) -> bool:
     if len(address_n) < 2:
         return True  # path is too short
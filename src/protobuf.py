@@ -11,6 +11,9 @@ interface is required:
 >>>         Reads `len(buffer)` bytes into `buffer`, or raises `EOFError`.
 >>>         """
 
+If the reader also has a `size` attribute with the remaining message length,
+small messages are read at once and parsed from memory, see `load_message`.
+
 For serializing (dumping) protobuf types, object with `AsyncWriter` interface is
 required:
 
@@ -25,6 +28,10 @@ from micropython import const
 
 _UVARINT_BUFFER = bytearray(1)
 
+# scratch space for skipping data, its contents are never used so it can be
+# shared by all readers
+_SKIP_BUFFER = bytearray(256)
+
 
 async def load_uvarint(reader):
     buffer = _UVARINT_BUFFER
@@ -39,6 +46,28 @@ async def load_uvarint(reader):
     return result
 
 
+async def skip(reader, n):
+    """
+    Read and throw away `n` bytes from `reader` in chunks, so that the memory
+    use does not depend on `n`.
+    """
+    _check_length(reader, n)
+    buffer = _SKIP_BUFFER
+    while n >= len(buffer):
+        await reader.areadinto(buffer)
+        n -= len(buffer)
+    if n:
+        await reader.areadinto(memoryview(buffer)[:n])
+
+
+def _check_length(reader, n):
+    # fail early if the reader knows it cannot provide `n` bytes, before
+    # anything of that length gets allocated
+    size = getattr(reader, "size", None)
+    if size is not None and size < n:
+        raise EOFError
+
+
 async def dump_uvarint(writer, n):
     if n < 0:
         raise ValueError("Cannot dump signed value, convert it to unsigned first.")
@@ -51,6 +80,14 @@ async def dump_uvarint(writer, n):
         n = shifted
 
 
+def uvarint_size(n):
+    size = 1
+    while n > 0x7F:
+        n >>= 7
+        size += 1
+    return size
+
+
 # protobuf interleaved signed encoding:
 # https://developers.google.com/protocol-buffers/docs/encoding#structure
 # the idea is to save the sign in LSbit instead of twos-complement.
@@ -109,13 +146,21 @@ class UnicodeType:
 class MessageType:
     WIRE_TYPE = 2
     FIELDS = {}
+    PLAN = None  # compiled `CodecPlan`, see `get_plan`
 
     def __init__(self, **kwargs):
         for kw in kwargs:
             setattr(self, kw, kwargs[kw])
 
     def __eq__(self, rhs):
-        return self.__class__ is rhs.__class__ and self.__dict__ == rhs.__dict__
+        # compare the schema fields only, unset fields are equal to `None`, this
+        # also works for messages keeping their fields in `__slots__`
+        if self.__class__ is not rhs.__class__:
+            return False
+        for fname in get_plan(self.__class__).names:
+            if getattr(self, fname, None) != getattr(rhs, fname, None):
+                return False
+        return True
 
     def __repr__(self):
         return "<%s>" % self.__class__.__name__
@@ -124,17 +169,98 @@ class MessageType:
 class LimitedReader:
     def __init__(self, reader, limit):
         self.reader = reader
-        self.limit = limit
+        self.size = limit
 
     async def areadinto(self, buf):
-        if self.limit < len(buf):
+        if self.size < len(buf):
             raise EOFError
         else:
             nread = await self.reader.areadinto(buf)
-            self.limit -= nread
+            self.size -= nread
             return nread
 
 
+class BufferReader:
+    """
+    Synchronous reader over an in-memory buffer, used to parse messages that
+    were received whole, see `decode_message`.
+    """
+
+    def __init__(self, buf, ofs=0, end=None):
+        self.buf = buf
+        self.ofs = ofs
+        self.end = len(buf) if end is None else end
+
+    def read_uvarint(self):
+        buf = self.buf
+        ofs = self.ofs
+        end = self.end
+        result = 0
+        shift = 0
+        byte = 0x80
+        while byte & 0x80:
+            if ofs >= end:
+                raise EOFError
+            byte = buf[ofs]
+            ofs += 1
+            result += (byte & 0x7F) << shift
+            shift += 7
+        self.ofs = ofs
+        return result
+
+    def read(self, n):
+        ofs = self.ofs
+        if self.end - ofs < n:
+            raise EOFError
+        self.ofs = ofs + n
+        return self.buf[ofs : ofs + n]
+
+    def view(self, n):
+        ofs = self.ofs
+        if self.end - ofs < n:
+            raise EOFError
+        self.ofs = ofs + n
+        return memoryview(self.buf)[ofs : ofs + n]
+
+    def skip(self, n):
+        if self.end - self.ofs < n:
+            raise EOFError
+        self.ofs += n
+
+
+class BufferWriter:
+    """
+    Synchronous writer into a preallocated buffer, see `encode_message`.
+    """
+
+    def __init__(self, buf, ofs=0):
+        self.buf = buf
+        self.ofs = ofs
+
+    def write(self, data):
+        ofs = self.ofs
+        end = ofs + len(data)
+        if end > len(self.buf):
+            raise EOFError
+        self.buf[ofs:end] = data
+        self.ofs = end
+
+    def write_uvarint(self, n):
+        if n < 0:
+            raise ValueError("Cannot dump signed value, convert it to unsigned first.")
+        buf = self.buf
+        ofs = self.ofs
+        shifted = True
+        while shifted:
+            if ofs >= len(buf):
+                raise EOFError
+            shifted = n >> 7
+            buf[ofs] = (n & 0x7F) | (0x80 if shifted else 0x00)
+            ofs += 1
+            n = shifted
+        self.ofs = ofs
+
+
 class CountingWriter:
     def __init__(self):
         self.size = 0
@@ -146,116 +272,447 @@ class CountingWriter:
 
 
 FLAG_REPEATED = const(1)
+# bytes field is loaded as a memoryview into the receive buffer instead of a
+# copy, handlers must not modify it.  only messages parsed from memory share
+# the buffer, streamed ones still get a buffer of their own for the field.
+FLAG_NOCOPY = const(2)
 
 
-async def load_message(reader, msg_type):
-    fields = msg_type.FIELDS
-    msg = msg_type()
+def set_nocopy(msg_type, ftag):
+    """
+    Flag bytes field `ftag` of `msg_type` with `FLAG_NOCOPY`.  Generated message
+    classes are not edited by hand, apps flag the fields they only read when
+    they import the message class.
+    """
+    fname, ftype, fflags = msg_type.FIELDS[ftag]
+    msg_type.FIELDS[ftag] = (fname, ftype, fflags | FLAG_NOCOPY)
+    msg_type.PLAN = None  # compiled again with the flag on the next use
+
+
+# messages up to this size are received whole and parsed synchronously from
+# memory, larger ones are parsed while streaming from the reader
+_BUFFERED_LIMIT = const(2048)
+
+
+def _decode_uvarint(ivalue):
+    return ivalue
+
+
+def _decode_bool(ivalue):
+    return bool(ivalue)
+
+
+def _decode_bytes(reader, ivalue, ftype):
+    return reader.read(ivalue)
+
+
+def _decode_bytes_nocopy(reader, ivalue, ftype):
+    return reader.view(ivalue)
+
+
+def _decode_unicode(reader, ivalue, ftype):
+    return bytes(reader.read(ivalue)).decode()
+
+
+def _decode_submessage(reader, ivalue, ftype):
+    ofs = reader.ofs
+    end = ofs + ivalue
+    if end > reader.end:
+        raise EOFError
+    reader.ofs = end
+    return decode_message(BufferReader(reader.buf, ofs, end), ftype)
+
+
+async def _load_bytes(reader, ivalue, ftype):
+    _check_length(reader, ivalue)
+    fvalue = bytearray(ivalue)
+    await reader.areadinto(fvalue)
+    return fvalue
+
+
+async def _load_unicode(reader, ivalue, ftype):
+    _check_length(reader, ivalue)
+    fvalue = bytearray(ivalue)
+    await reader.areadinto(fvalue)
+    return bytes(fvalue).decode()
+
+
+async def _load_submessage(reader, ivalue, ftype):
+    # small enough sub-messages are parsed from memory, see `load_message`
+    _check_length(reader, ivalue)
+    return await load_message(LimitedReader(reader, ivalue), ftype)
+
+
+def _encode_uvarint(svalue):
+    return svalue
+
+
+def _encode_bool(svalue):
+    return int(svalue)
+
+
+def _encode_bytes(writer, svalue, sizes):
+    writer.write_uvarint(len(svalue))
+    writer.write(svalue)
+
+
+def _encode_unicode(writer, svalue, sizes):
+    bvalue = svalue.encode()
+    writer.write_uvarint(len(bvalue))
+    writer.write(bvalue)
+
+
+def _encode_submessage(writer, svalue, sizes):
+    writer.write_uvarint(next(sizes))
+    _encode_message(writer, svalue, sizes)
+
+
+async def _dump_bytes(writer, svalue, sizes):
+    await dump_uvarint(writer, len(svalue))
+    await writer.awrite(svalue)
+
+
+async def _dump_unicode(writer, svalue, sizes):
+    bvalue = svalue.encode()
+    await dump_uvarint(writer, len(bvalue))
+    await writer.awrite(bvalue)
+
 
-    while True:
-        try:
-            fkey = await load_uvarint(reader)
-        except EOFError:
-            break  # no more fields to load
+async def _dump_submessage(writer, svalue, sizes):
+    await dump_uvarint(writer, next(sizes))
+    await _dump_message(writer, svalue, sizes)
 
+
+def _count_bytes(svalue, sizes):
+    return len(svalue)
+
+
+def _count_unicode(svalue, sizes):
+    return len(svalue.encode())
+
+
+def _count_submessage(svalue, sizes):
+    # reserve the slot first, sizes are consumed in the order of dumping
+    index = len(sizes)
+    sizes.append(0)
+    size = count_message(svalue, sizes)
+    sizes[index] = size
+    return size
+
+
+# field type -> (decoder, loader, encoder, dumper, counter).  for varint wire
+# types the decoder and encoder are plain functions converting between the field
+# value and the unsigned varint.  for length-delimited wire types the decoder
+# and encoder work synchronously on a `BufferReader` and `BufferWriter`, loader
+# and dumper are coroutines working on the stream and the counter returns the
+# length of the encoded value.
+_CODECS = {
+    UVarintType: (_decode_uvarint, None, _encode_uvarint, None, None),
+    SVarintType: (uint_to_sint, None, sint_to_uint, None, None),
+    BoolType: (_decode_bool, None, _encode_bool, None, None),
+    BytesType: (_decode_bytes, _load_bytes, _encode_bytes, _dump_bytes, _count_bytes),
+    UnicodeType: (
+        _decode_unicode,
+        _load_unicode,
+        _encode_unicode,
+        _dump_unicode,
+        _count_unicode,
+    ),
+}
+
+
+class CodecPlan:
+    """
+    Per-class codec tables, compiled once from `FIELDS` so that loading and
+    dumping does not need to dispatch on the field type for every field.
+    """
+
+    def __init__(self, msg_type):
+        self.msg_type = msg_type
+        # tag -> (name, wire type, decoder, loader, type, repeated)
+        self.decoders = {}
+        # (name, key, key size, wire type, encoder, dumper, counter, repeated)
+        self.encoders = []
+        self.names = []  # names of all fields, filled with None if missing
+
+        fields = msg_type.FIELDS
+        for ftag in fields:
+            fname, ftype, fflags = fields[ftag]
+            if ftype in _CODECS:
+                decoder, loader, encoder, dumper, counter = _CODECS[ftype]
+            elif issubclass(ftype, MessageType):
+                decoder, loader, encoder, dumper, counter = (
+                    _decode_submessage,
+                    _load_submessage,
+                    _encode_submessage,
+                    _dump_submessage,
+                    _count_submessage,
+                )
+            else:
+                raise TypeError  # field type is unknown
+            if ftype is BytesType and fflags & FLAG_NOCOPY:
+                decoder = _decode_bytes_nocopy
+            wtype = ftype.WIRE_TYPE
+            repeated = fflags & FLAG_REPEATED
+            self.decoders[ftag] = (fname, wtype, decoder, loader, ftype, repeated)
+            fkey = (ftag << 3) | wtype
+            ksize = uvarint_size(fkey)
+            self.encoders.append(
+                (fname, fkey, ksize, wtype, encoder, dumper, counter, repeated)
+            )
+            self.names.append(fname)
+
+
+def get_plan(msg_type):
+    """Return the codec plan of `msg_type`, compiling it on the first use."""
+    plan = msg_type.PLAN
+    # plan is cached on the class, make sure it is not inherited from a parent
+    if plan is None or plan.msg_type is not msg_type:
+        plan = msg_type.PLAN = CodecPlan(msg_type)
+    return plan
+
+
+def decode_message(reader, msg_type):
+    """Parse a message of `msg_type` from the rest of `BufferReader` `reader`."""
+    plan = get_plan(msg_type)
+    decoders = plan.decoders
+    msg = msg_type()
+
+    while reader.ofs < reader.end:
+        fkey = reader.read_uvarint()
         ftag = fkey >> 3
         wtype = fkey & 7
 
-        field = fields.get(ftag, None)
+        field = decoders.get(ftag, None)
 
         if field is None:  # unknown field, skip it
             if wtype == 0:
-                await load_uvarint(reader)
+                reader.read_uvarint()
             elif wtype == 2:
-                ivalue = await load_uvarint(reader)
-                await reader.areadinto(bytearray(ivalue))
+                reader.skip(reader.read_uvarint())
             else:
                 raise ValueError
             continue
 
-        fname, ftype, fflags = field
-        if wtype != ftype.WIRE_TYPE:
+        fname, fwtype, decoder, _, ftype, repeated = field
+        if wtype != fwtype:
             raise TypeError  # parsed wire type differs from the schema
 
-        ivalue = await load_uvarint(reader)
-
-        if ftype is UVarintType:
-            fvalue = ivalue
-        elif ftype is SVarintType:
-            fvalue = uint_to_sint(ivalue)
-        elif ftype is BoolType:
-            fvalue = bool(ivalue)
-        elif ftype is BytesType:
-            fvalue = bytearray(ivalue)
-            await reader.areadinto(fvalue)
-        elif ftype is UnicodeType:
-            fvalue = bytearray(ivalue)
-            await reader.areadinto(fvalue)
-            fvalue = bytes(fvalue).decode()
-        elif issubclass(ftype, MessageType):
-            fvalue = await load_message(LimitedReader(reader, ivalue), ftype)
+        ivalue = reader.read_uvarint()
+
+        if wtype == 0:
+            fvalue = decoder(ivalue)
         else:
-            raise TypeError  # field type is unknown
+            fvalue = decoder(reader, ivalue, ftype)
 
-        if fflags & FLAG_REPEATED:
+        if repeated:
             pvalue = getattr(msg, fname, [])
             pvalue.append(fvalue)
             fvalue = pvalue
         setattr(msg, fname, fvalue)
 
     # fill missing fields
-    for tag in msg.FIELDS:
-        field = msg.FIELDS[tag]
-        if not hasattr(msg, field[0]):
-            setattr(msg, field[0], None)
+    for fname in plan.names:
+        if not hasattr(msg, fname):
+            setattr(msg, fname, None)
 
     return msg
 
 
-async def dump_message(writer, msg):
-    repvalue = [0]
-    mtype = msg.__class__
-    fields = mtype.FIELDS
+async def load_message(reader, msg_type):
+    """
+    Load a message of `msg_type` from `reader`.  If the reader knows the
+    remaining message `size` and it is small enough, the message is received
+    in one read and parsed synchronously, otherwise it is parsed while
+    streaming.
+    """
+    size = getattr(reader, "size", None)
+    if size is not None and size <= _BUFFERED_LIMIT:
+        buf = bytearray(size)
+        await reader.areadinto(buf)
+        return decode_message(BufferReader(buf), msg_type)
+
+    stream = MessageStream(reader, msg_type)
+    await stream.next()
+    return stream.msg
+
+
+class MessageStream:
+    """
+    Streaming decoder of a message of `msg_type`.  Values of the repeated
+    fields named in `streamed` are not collected on the message, `next()`
+    returns them one at a time as they arrive from `reader`, so the whole
+    list never has to be kept in memory.  All other fields are loaded into
+    `msg`, which is complete after `next()` returns `None`.
+
+    Example:
+
+    >>> stream = MessageStream(reader, NEMTransfer, ("mosaics",))
+    >>> while True:
+    >>>     item = await stream.next()
+    >>>     if item is None:
+    >>>         break
+    >>>     fname, mosaic = item
+    >>> transfer = stream.msg
+    """
+
+    def __init__(self, reader, msg_type, streamed=()):
+        self.reader = reader
+        self.plan = get_plan(msg_type)
+        self.streamed = streamed
+        self.msg = msg_type()
+
+    async def next(self):
+        """
+        Load fields until a value of a streamed field is found and return it as
+        a `(name, value)` tuple.  Return `None` at the end of the message.
+        """
+        reader = self.reader
+        decoders = self.plan.decoders
+        streamed = self.streamed
+        msg = self.msg
+
+        while True:
+            try:
+                fkey = await load_uvarint(reader)
+            except EOFError:
+                break  # no more fields to load
+
+            ftag = fkey >> 3
+            wtype = fkey & 7
+
+            field = decoders.get(ftag, None)
+
+            if field is None:  # unknown field, skip it
+                if wtype == 0:
+                    await load_uvarint(reader)
+                elif wtype == 2:
+                    await skip(reader, await load_uvarint(reader))
+                else:
+                    raise ValueError
+                continue
+
+            fname, fwtype, decoder, loader, ftype, repeated = field
+            if wtype != fwtype:
+                raise TypeError  # parsed wire type differs from the schema
+
+            ivalue = await load_uvarint(reader)
+
+            if wtype == 0:
+                fvalue = decoder(ivalue)
+            else:
+                fvalue = await loader(reader, ivalue, ftype)
 
-    for ftag in fields:
-        fname, ftype, fflags = fields[ftag]
+            if fname in streamed:
+                return fname, fvalue
 
+            if repeated:
+                pvalue = getattr(msg, fname, [])
+                pvalue.append(fvalue)
+                fvalue = pvalue
+            setattr(msg, fname, fvalue)
+
+        # fill missing fields
+        for fname in self.plan.names:
+            if not hasattr(msg, fname):
+                setattr(msg, fname, None)
+
+        return None
+
+
+def count_message(msg, sizes):
+    """
+    Return the encoded size of `msg`.  Sizes of all embedded messages are
+    appended to `sizes` in the order `dump_message` needs them, so that every
+    message is measured exactly once.
+    """
+    repvalue = [0]
+    total = 0
+
+    for fname, _, ksize, wtype, encoder, _, counter, repeated in get_plan(
+        msg.__class__
+    ).encoders:
         fvalue = getattr(msg, fname, None)
         if fvalue is None:
             continue
 
-        fkey = (ftag << 3) | ftype.WIRE_TYPE
+        if not repeated:
+            repvalue[0] = fvalue
+            fvalue = repvalue
+
+        for svalue in fvalue:
+            if wtype == 0:
+                total += ksize + uvarint_size(encoder(svalue))
+            else:
+                size = counter(svalue, sizes)
+                total += ksize + uvarint_size(size) + size
+
+    return total
+
+
+async def dump_message(writer, msg, sizes=None):
+    """
+    Write `msg` to `writer`.  Pass `sizes` filled by `count_message` if the
+    message was already measured, otherwise it gets measured first.
+    """
+    if sizes is None:
+        sizes = []
+        count_message(msg, sizes)
+    await _dump_message(writer, msg, iter(sizes))
+
+
+async def _dump_message(writer, msg, sizes):
+    repvalue = [0]
+
+    for fname, fkey, _, wtype, encoder, dumper, _, repeated in get_plan(
+        msg.__class__
+    ).encoders:
+        fvalue = getattr(msg, fname, None)
+        if fvalue is None:
+            continue
 
-        if not fflags & FLAG_REPEATED:
+        if not repeated:
             repvalue[0] = fvalue
             fvalue = repvalue
 
         for svalue in fvalue:
             await dump_uvarint(writer, fkey)
 
-            if ftype is UVarintType:
-                await dump_uvarint(writer, svalue)
+            if wtype == 0:
+                await dump_uvarint(writer, encoder(svalue))
+            else:
+                await dumper(writer, svalue, sizes)
 
-            elif ftype is SVarintType:
-                await dump_uvarint(writer, sint_to_uint(svalue))
 
-            elif ftype is BoolType:
-                await dump_uvarint(writer, int(svalue))
+def encode_message(writer, msg, sizes=None):
+    """
+    Synchronous counterpart of `dump_message`, writing `msg` to a writer with
+    `write` and `write_uvarint` methods, such as `BufferWriter`.
+    """
+    if sizes is None:
+        sizes = []
+        count_message(msg, sizes)
+    _encode_message(writer, msg, iter(sizes))
 
-            elif ftype is BytesType:
-                await dump_uvarint(writer, len(svalue))
-                await writer.awrite(svalue)
 
-            elif ftype is UnicodeType:
-                bvalue = svalue.encode()
-                await dump_uvarint(writer, len(bvalue))
-                await writer.awrite(bvalue)
+def _encode_message(writer, msg, sizes):
+    repvalue = [0]
 
-            elif issubclass(ftype, MessageType):
-                counter = CountingWriter()
-                await dump_message(counter, svalue)
-                await dump_uvarint(writer, counter.size)
-                await dump_message(writer, svalue)
+    for fname, fkey, _, wtype, encoder, _, _, repeated in get_plan(
+        msg.__class__
+    ).encoders:
+        fvalue = getattr(msg, fname, None)
+        if fvalue is None:
+            continue
+
+        if not repeated:
+            repvalue[0] = fvalue
+            fvalue = repvalue
 
+        for svalue in fvalue:
+            writer.write_uvarint(fkey)
+
+            if wtype == 0:
+                writer.write_uvarint(encoder(svalue))
             else:
-                raise TypeError
+                encoder(writer, svalue, sizes)
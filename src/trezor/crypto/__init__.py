@@ -1,5 +1,3 @@
-from gc import collect
-
 from trezorcrypto import (  # noqa: F401
     aes,
     bip32,
@@ -12,6 +10,8 @@ from trezorcrypto import (  # noqa: F401
     rfc6979,
 )
 
+from trezor import gcpolicy
+
 
 class SecureContext:
     def __init__(self):
@@ -25,4 +25,5 @@ class SecureContext:
             o = getattr(self, k)
             if hasattr(o, "__del__"):
                 o.__del__()
-        collect()
+        # do not leave the secrets lying around in the heap
+        gcpolicy.collect()
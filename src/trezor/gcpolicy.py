@@ -0,0 +1,40 @@
+"""
+Garbage collection policy.  Instead of collecting the heap after every
+workflow, `maybe_collect` collects only when the free heap drops under
+`MIN_FREE`, or when more than `_MAX_ALLOCATED` bytes were allocated since the
+last collection.  The allocation is counted in bytes, not per unit of time,
+workflows spend most of their time waiting for the user and the heap fills
+with what they allocate, not with how fast.  Memory that held secrets is
+collected explicitly with `collect`.  Number of collections and the time
+spent in them are counted.
+"""
+
+import gc
+import utime
+from micropython import const
+
+MIN_FREE = const(48 * 1024)  # collect if less heap than this is free
+_MAX_ALLOCATED = const(24 * 1024)  # collect if this much was allocated since
+
+collections = 0  # number of collections
+collect_time = 0  # total time spent collecting, in us
+_free_after = gc.mem_free()  # free heap right after the last collection
+
+
+def collect():
+    """Collect the heap unconditionally."""
+    global collections, collect_time, _free_after
+    start = utime.ticks_us()
+    gc.collect()
+    collect_time += utime.ticks_diff(utime.ticks_us(), start)
+    collections += 1
+    _free_after = gc.mem_free()
+
+
+def maybe_collect():
+    """Collect the heap if it is needed, return True if it was collected."""
+    free = gc.mem_free()
+    if free < MIN_FREE or _free_after - free > _MAX_ALLOCATED:
+        collect()
+        return True
+    return False
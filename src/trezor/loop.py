@@ -5,6 +5,7 @@ stepped through until completion, and can get asynchronously blocked by
 `yield`ing or `await`ing a syscall.
 
 See `schedule`, `run`, and syscalls `sleep`, `wait`, `signal` and `spawn`.
+For deterministic runs in tests, see `use_virtual_clock`.
 """
 
 import utime
@@ -14,10 +15,22 @@ from micropython import const
 from trezor import io, log
 
 after_step_hook = None  # function, called after each task step
+before_poll_hook = None  # function, called with the delay before waiting for an event
 
-_QUEUE_SIZE = const(64)  # maximum number of scheduled tasks
+_QUEUE_SIZE = const(64)  # initial capacity of the task queue, grows if needed
 _queue = utimeq.utimeq(_QUEUE_SIZE)
-_paused = {}
+_queue_size = _QUEUE_SIZE
+_paused = {}  # iface -> set of tasks paused on it
+_paused_ifaces = {}  # task -> iface it is paused on
+_finalizers = {}  # task -> function called with the result when it finishes
+_type_gen = type((lambda: (yield))())
+
+# clock of the scheduler, replaced in the virtual clock mode
+ticks_us = utime.ticks_us
+ticks_ms = utime.ticks_ms
+_virtual_clock = False
+_virtual_us = 0  # current time of the virtual clock
+_TICKS_MASK = utime.ticks_add(0, -1)  # ticks wrap around as in utime
 
 if __debug__:
     # for performance stats
@@ -27,6 +40,17 @@ if __debug__:
     log_delay_rb_len = const(10)
     log_delay_rb = array.array("i", [0] * log_delay_rb_len)
 
+    # profiling stats, collected only while enabled by `profile`
+    profiling = False
+    poll_time = 0  # total time spent in io.poll(), in us
+    step_time = 0  # total time spent stepping the tasks, in us
+    task_stats = {}  # task name -> [step count, total step time, longest step]
+    queue_depth_pos = 0
+    queue_depth_rb_len = const(16)
+    queue_depth_rb = array.array("i", [0] * queue_depth_rb_len)
+    queue_depth_max = 0
+    _TASK_STATS_SIZE = const(32)  # maximum number of tasks with stats
+
 
 def schedule(task, value=None, deadline=None):
     """
@@ -34,21 +58,41 @@ def schedule(task, value=None, deadline=None):
     microseconds).  Does not start the event loop itself, see `run`.
     """
     if deadline is None:
-        deadline = utime.ticks_us()
+        deadline = ticks_us()
+    if len(_queue) == _queue_size:
+        _grow_queue()
     _queue.push(deadline, task, value)
 
 
+def _grow_queue():
+    # utimeq has a fixed capacity, move the tasks into a twice larger one
+    global _queue, _queue_size
+    queue = utimeq.utimeq(_queue_size * 2)
+    entry = [0, 0, 0]  # deadline, task, value
+    while _queue:
+        _queue.pop(entry)
+        queue.push(entry[0], entry[1], entry[2])
+    _queue = queue
+    _queue_size *= 2
+
+
 def pause(task, iface):
     tasks = _paused.get(iface, None)
     if tasks is None:
         tasks = _paused[iface] = set()
     tasks.add(task)
+    _paused_ifaces[task] = iface
 
 
 def close(task):
-    for iface in _paused:
-        _paused[iface].discard(task)
+    iface = _paused_ifaces.pop(task, None)
+    if iface is not None:
+        # the set is already gone if the task is being dispatched in `run`
+        tasks = _paused.get(iface)
+        if tasks is not None:
+            tasks.discard(task)
     _queue.discard(task)
+    _finalizers.pop(task, None)
     task.close()
 
 
@@ -61,7 +105,7 @@ def run():
     """
 
     if __debug__:
-        global log_delay_pos
+        global log_delay_pos, queue_depth_pos, queue_depth_max, poll_time
 
     max_delay = const(1000000)  # usec delay if queue is empty
 
@@ -70,25 +114,86 @@ def run():
     while _queue or _paused:
         # compute the maximum amount of time we can wait for a message
         if _queue:
-            delay = utime.ticks_diff(_queue.peektime(), utime.ticks_us())
+            delay = utime.ticks_diff(_queue.peektime(), ticks_us())
         else:
             delay = max_delay
 
+        if before_poll_hook and delay > 0:
+            before_poll_hook(delay)
+
+        if _virtual_clock and _queue:
+            # only check for pending I/O, the waiting is skipped below.  with
+            # no task scheduled, there is nothing to skip to, wait for I/O
+            timeout = 0
+        else:
+            timeout = delay
+
         if __debug__:
             # add current delay to ring buffer for performance stats
             log_delay_rb[log_delay_pos] = delay
             log_delay_pos = (log_delay_pos + 1) % log_delay_rb_len
 
-        if io.poll(_paused, msg_entry, delay):
+        if __debug__ and profiling:
+            depth = len(_queue)
+            queue_depth_rb[queue_depth_pos] = depth
+            queue_depth_pos = (queue_depth_pos + 1) % queue_depth_rb_len
+            queue_depth_max = max(queue_depth_max, depth)
+            start = utime.ticks_us()
+            polled = io.poll(_paused, msg_entry, timeout)
+            poll_time += utime.ticks_diff(utime.ticks_us(), start)
+            step = _profiled_step
+        else:
+            polled = io.poll(_paused, msg_entry, timeout)
+            step = _step
+
+        if polled:
             # message received, run tasks paused on the interface
             msg_tasks = _paused.pop(msg_entry[0], ())
             for task in msg_tasks:
-                _step(task, msg_entry[1])
+                # skip tasks closed by a task stepped before them, e.g. the
+                # siblings of a finished `spawn` child
+                if _paused_ifaces.pop(task, None) is not None:
+                    step(task, msg_entry[1])
         else:
             # timeout occurred, run the first scheduled task
             if _queue:
+                if _virtual_clock and delay > 0:
+                    _advance_virtual_clock(delay)
                 _queue.pop(task_entry)
-                _step(task_entry[1], task_entry[2])
+                step(task_entry[1], task_entry[2])
+
+
+def use_virtual_clock(enable=True):
+    """
+    Switch the scheduler to a virtual clock, starting at zero.  Whenever no I/O
+    is pending, the clock jumps straight to the deadline of the next scheduled
+    task instead of waiting for it, so that sleeps and timeouts take no real
+    time and runs are deterministic.  Meant for tests and emulator runs, switch
+    the clock only while no task is scheduled.  Code measuring time should use
+    `loop.ticks_us` and `loop.ticks_ms`, which follow the selected clock.
+    """
+    global ticks_us, ticks_ms, _virtual_clock, _virtual_us
+    _virtual_clock = enable
+    _virtual_us = 0
+    if enable:
+        ticks_us = _virtual_ticks_us
+        ticks_ms = _virtual_ticks_ms
+    else:
+        ticks_us = utime.ticks_us
+        ticks_ms = utime.ticks_ms
+
+
+def _virtual_ticks_us():
+    return _virtual_us & _TICKS_MASK
+
+
+def _virtual_ticks_ms():
+    return (_virtual_us // 1000) & _TICKS_MASK
+
+
+def _advance_virtual_clock(delay):
+    global _virtual_us
+    _virtual_us += delay
 
 
 def _step(task, value):
@@ -100,8 +205,14 @@ def _step(task, value):
     except StopIteration as e:
         if __debug__:
             log.debug(__name__, "finish: %s", task)
+        finalizer = _finalizers.pop(task, None)
+        if finalizer is not None:
+            finalizer(task, e.value)
     except Exception as e:
-        if __debug__:
+        finalizer = _finalizers.pop(task, None)
+        if finalizer is not None:
+            finalizer(task, e)
+        elif __debug__:
             log.exception(__name__, e)
     else:
         if isinstance(result, Syscall):
@@ -115,6 +226,52 @@ def _step(task, value):
             after_step_hook()
 
 
+if __debug__:
+
+    def profile(enable):
+        """Enable or disable collecting of the profiling stats."""
+        global profiling
+        profiling = enable
+
+    def reset_stats():
+        """Clear the profiling stats."""
+        global poll_time, step_time, queue_depth_pos, queue_depth_max
+        poll_time = 0
+        step_time = 0
+        task_stats.clear()
+        queue_depth_pos = 0
+        queue_depth_max = 0
+        for i in range(queue_depth_rb_len):
+            queue_depth_rb[i] = 0
+
+    def _profiled_step(task, value):
+        global step_time
+        # get the name before stepping, the task can finish in the step
+        name = _task_name(task)
+        start = utime.ticks_us()
+        _step(task, value)
+        elapsed = utime.ticks_diff(utime.ticks_us(), start)
+        step_time += elapsed
+        stats = task_stats.get(name)
+        if stats is None:
+            if len(task_stats) >= _TASK_STATS_SIZE:
+                return
+            stats = task_stats[name] = [0, 0, 0]
+        stats[0] += 1
+        stats[1] += elapsed
+        if elapsed > stats[2]:
+            stats[2] = elapsed
+
+    def _task_name(task):
+        # stats of all instances of a coroutine are kept together, so that
+        # short-lived tasks do not fill up the table
+        name = getattr(task, "__qualname__", None) or getattr(task, "__name__", None)
+        if name is None:
+            # "<generator object 'name' at 20001234>", drop the address
+            name = repr(task).split(" at ")[0]
+        return name
+
+
 class Syscall:
     """
     When tasks want to perform any I/O, or do any sort of communication with the
@@ -135,14 +292,14 @@ class sleep(Syscall):
     Example:
 
     >>> planned = await loop.sleep(1000 * 1000)  # sleep for 1ms
-    >>> print('missed by %d us', utime.ticks_diff(utime.ticks_us(), planned))
+    >>> print('missed by %d us', utime.ticks_diff(loop.ticks_us(), planned))
     """
 
     def __init__(self, delay_us):
         self.delay_us = delay_us
 
     def handle(self, task):
-        deadline = utime.ticks_add(utime.ticks_us(), self.delay_us)
+        deadline = utime.ticks_add(ticks_us(), self.delay_us)
         schedule(task, deadline, deadline)
 
 
@@ -238,37 +395,35 @@ class spawn(Syscall):
     def __init__(self, *children, exit_others=True):
         self.children = children
         self.exit_others = exit_others
-        self.scheduled = None  # list of scheduled wrapper tasks
+        self.scheduled = None  # list of scheduled child tasks
         self.finished = None  # list of children that finished
         self.callback = None
 
     def handle(self, task):
         self.callback = task
         self.finished = []
-        self.scheduled = []
-        for index, child in enumerate(self.children):
-            parent = self._wait(child, index)
-            schedule(parent)
-            self.scheduled.append(parent)
-
-    def exit(self, skip_index=-1):
-        for index, parent in enumerate(self.scheduled):
-            if index != skip_index:
-                close(parent)
-
-    async def _wait(self, child, index):
-        try:
-            result = await child
-        except Exception as e:
-            self._finish(child, index, e)
-        else:
-            self._finish(child, index, result)
-
-    def _finish(self, child, index, result):
+        # children are scheduled as tasks of their own, without any wrapper,
+        # `_finish` gets called by the scheduler when one of them finishes
+        scheduled = self.scheduled = []
+        finish = self._finish
+        for child in self.children:
+            if not isinstance(child, _type_gen):
+                child = iter(child)
+            scheduled.append(child)
+            _finalizers[child] = finish
+            schedule(child)
+
+    def exit(self, except_for=None):
+        for child in self.scheduled:
+            if child is not except_for:
+                close(child)
+
+    def _finish(self, child, result):
         if not self.finished:
-            self.finished.append(child)
+            index = self.scheduled.index(child)
+            self.finished.append(self.children[index])
             if self.exit_others:
-                self.exit(index)
+                self.exit(child)
             schedule(self.callback, result)
 
     def __iter__(self):
@@ -309,23 +464,22 @@ class take(Syscall):
 class chan:
     def __init__(self, id=None):
         self.id = id
-        self.putters = []
-        self.takers = []
+        self.putters = fifo()
+        self.takers = fifo()
         self.put = put(self)
         self.take = take(self)
 
     def schedule_publish(self, schedule, value):
         if self.takers:
-            for taker in self.takers:
-                schedule(taker, value)
-            self.takers.clear()
+            while self.takers:
+                schedule(self.takers.popleft(), value)
             return True
         else:
             return False
 
     def schedule_put(self, schedule, putter, value):
         if self.takers:
-            taker = self.takers.pop(0)
+            taker = self.takers.popleft()
             schedule(taker, value)
             schedule(putter, value)
             return True
@@ -335,10 +489,49 @@ class chan:
 
     def schedule_take(self, schedule, taker):
         if self.putters:
-            putter, value = self.putters.pop(0)
+            putter, value = self.putters.popleft()
             schedule(taker, value)
             schedule(putter, value)
             return True
         else:
             self.takers.append(taker)
             return False
+
+
+class fifo:
+    """
+    First-in first-out queue with amortized O(1) `popleft()`, unlike
+    `list.pop(0)` that moves all the remaining items.
+    """
+
+    def __init__(self):
+        self.items = []
+        self.head = 0  # index of the first item
+
+    def __len__(self):
+        return len(self.items) - self.head
+
+    def append(self, item):
+        self.items.append(item)
+
+    def popleft(self):
+        items = self.items
+        head = self.head
+        if head == len(items):
+            raise IndexError
+        item = items[head]
+        items[head] = None
+        head += 1
+        if head == len(items):
+            items.clear()
+            head = 0
+        elif head * 2 >= len(items) and head >= 8:
+            # drop the consumed slots once they take half of the list
+            del items[:head]
+            head = 0
+        self.head = head
+        return item
+
+    def clear(self):
+        self.items.clear()
+        self.head = 0
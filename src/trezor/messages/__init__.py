@@ -1,9 +1,8 @@
-from trezor.messages import MessageType
+from trezor.messages.wire_types import type_to_name
 
 if __debug__:
     from trezor import log
 
-type_to_name = {}  # int -> string, reverse table of wire_type mapping
 registered = {}  # int -> class, dynamically registered message types
 
 
@@ -20,13 +19,9 @@ def get_type(wire_type):
         # message class is explicitly registered
         msg_type = registered[wire_type]
     else:
-        # import message class from trezor.messages dynamically
+        # import message class from trezor.messages dynamically, it is not
+        # cached here so that unloaded message modules can be collected
         name = type_to_name[wire_type]
-        module = __import__("trezor.messages.%s" % name, None, None, (name,), 0)
+        module = __import__("trezor.messages." + name, None, None, (name,), 0)
         msg_type = getattr(module, name)
     return msg_type
-
-
-# build reverse table of wire types
-for msg_name in dir(MessageType):
-    type_to_name[getattr(MessageType, msg_name)] = msg_name
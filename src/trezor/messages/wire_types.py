@@ -0,0 +1,159 @@
+# Automatically generated by build_wire_types
+# fmt: off
+type_to_name = {
+    0: 'Initialize',
+    1: 'Ping',
+    2: 'Success',
+    3: 'Failure',
+    4: 'ChangePin',
+    5: 'WipeDevice',
+    6: 'FirmwareErase',
+    7: 'FirmwareUpload',
+    8: 'FirmwareRequest',
+    9: 'GetEntropy',
+    10: 'Entropy',
+    11: 'GetPublicKey',
+    12: 'PublicKey',
+    13: 'LoadDevice',
+    14: 'ResetDevice',
+    15: 'SignTx',
+    17: 'Features',
+    18: 'PinMatrixRequest',
+    19: 'PinMatrixAck',
+    20: 'Cancel',
+    21: 'TxRequest',
+    22: 'TxAck',
+    23: 'CipherKeyValue',
+    24: 'ClearSession',
+    25: 'ApplySettings',
+    26: 'ButtonRequest',
+    27: 'ButtonAck',
+    28: 'ApplyFlags',
+    29: 'GetAddress',
+    30: 'Address',
+    32: 'SelfTest',
+    34: 'BackupDevice',
+    35: 'EntropyRequest',
+    36: 'EntropyAck',
+    38: 'SignMessage',
+    39: 'VerifyMessage',
+    40: 'MessageSignature',
+    41: 'PassphraseRequest',
+    42: 'PassphraseAck',
+    45: 'RecoveryDevice',
+    46: 'WordRequest',
+    47: 'WordAck',
+    48: 'CipheredKeyValue',
+    53: 'SignIdentity',
+    54: 'SignedIdentity',
+    55: 'GetFeatures',
+    56: 'EthereumGetAddress',
+    57: 'EthereumAddress',
+    58: 'EthereumSignTx',
+    59: 'EthereumTxRequest',
+    60: 'EthereumTxAck',
+    61: 'GetECDHSessionKey',
+    62: 'ECDHSessionKey',
+    63: 'SetU2FCounter',
+    64: 'EthereumSignMessage',
+    65: 'EthereumVerifyMessage',
+    66: 'EthereumMessageSignature',
+    67: 'NEMGetAddress',
+    68: 'NEMAddress',
+    69: 'NEMSignTx',
+    70: 'NEMSignedTx',
+    71: 'CosiCommit',
+    72: 'CosiCommitment',
+    73: 'CosiSign',
+    74: 'CosiSignature',
+    75: 'NEMDecryptMessage',
+    76: 'NEMDecryptedMessage',
+    77: 'PassphraseStateRequest',
+    78: 'PassphraseStateAck',
+    100: 'DebugLinkDecision',
+    101: 'DebugLinkGetState',
+    102: 'DebugLinkState',
+    103: 'DebugLinkStop',
+    104: 'DebugLinkLog',
+    110: 'DebugLinkMemoryRead',
+    111: 'DebugLinkMemory',
+    112: 'DebugLinkMemoryWrite',
+    113: 'DebugLinkFlashErase',
+    114: 'LiskGetAddress',
+    115: 'LiskAddress',
+    116: 'LiskSignTx',
+    117: 'LiskSignedTx',
+    118: 'LiskSignMessage',
+    119: 'LiskMessageSignature',
+    120: 'LiskVerifyMessage',
+    121: 'LiskGetPublicKey',
+    122: 'LiskPublicKey',
+    150: 'TezosGetAddress',
+    151: 'TezosAddress',
+    152: 'TezosSignTx',
+    153: 'TezosSignedTx',
+    154: 'TezosGetPublicKey',
+    155: 'TezosPublicKey',
+    202: 'StellarSignTx',
+    203: 'StellarTxOpRequest',
+    207: 'StellarGetAddress',
+    208: 'StellarAddress',
+    210: 'StellarCreateAccountOp',
+    211: 'StellarPaymentOp',
+    212: 'StellarPathPaymentOp',
+    213: 'StellarManageOfferOp',
+    214: 'StellarCreatePassiveOfferOp',
+    215: 'StellarSetOptionsOp',
+    216: 'StellarChangeTrustOp',
+    217: 'StellarAllowTrustOp',
+    218: 'StellarAccountMergeOp',
+    220: 'StellarManageDataOp',
+    221: 'StellarBumpSequenceOp',
+    230: 'StellarSignedTx',
+    303: 'CardanoSignTx',
+    304: 'CardanoTxRequest',
+    305: 'CardanoGetPublicKey',
+    306: 'CardanoPublicKey',
+    307: 'CardanoGetAddress',
+    308: 'CardanoAddress',
+    309: 'CardanoTxAck',
+    310: 'CardanoSignedTx',
+    350: 'OntologyGetAddress',
+    351: 'OntologyAddress',
+    352: 'OntologyGetPublicKey',
+    353: 'OntologyPublicKey',
+    354: 'OntologySignTransfer',
+    355: 'OntologySignedTransfer',
+    356: 'OntologySignWithdrawOng',
+    357: 'OntologySignedWithdrawOng',
+    358: 'OntologySignOntIdRegister',
+    359: 'OntologySignedOntIdRegister',
+    360: 'OntologySignOntIdAddAttributes',
+    361: 'OntologySignedOntIdAddAttributes',
+    400: 'RippleGetAddress',
+    401: 'RippleAddress',
+    402: 'RippleSignTx',
+    403: 'RippleSignedTx',
+    501: 'MoneroTransactionSignRequest',
+    502: 'MoneroTransactionInitAck',
+    503: 'MoneroTransactionSetInputAck',
+    504: 'MoneroTransactionInputsPermutationAck',
+    505: 'MoneroTransactionInputViniAck',
+    506: 'MoneroTransactionSetOutputAck',
+    507: 'MoneroTransactionAllOutSetAck',
+    508: 'MoneroTransactionMlsagDoneAck',
+    509: 'MoneroTransactionSignInputAck',
+    510: 'MoneroTransactionFinalAck',
+    511: 'MoneroKeyImageSyncRequest',
+    513: 'MoneroTransactionAllInputsSetAck',
+    514: 'MoneroTransactionRangeSigAck',
+    520: 'MoneroKeyImageExportInitAck',
+    521: 'MoneroKeyImageSyncStepAck',
+    522: 'MoneroKeyImageSyncFinalAck',
+    530: 'MoneroGetAddress',
+    531: 'MoneroAddress',
+    532: 'MoneroGetWatchKey',
+    533: 'MoneroWatchKey',
+    536: 'DebugMoneroDiagRequest',
+    537: 'DebugMoneroDiagAck',
+}
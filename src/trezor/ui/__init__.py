@@ -5,20 +5,137 @@ from trezorui import Display
 
 from trezor import io, loop, res, utils, workflow
 
-display = Display()
+# the screen is pushed to the display at most once per frame interval, and
+# before the loop blocks for longer than the rest of the frame, if anything was
+# drawn on it since the last refresh
+_FRAME_INTERVAL_US = const(1000000 // 30)
+_refresh_dirty = False
+_refresh_last = 0
+
+
+class _Display:
+    """
+    Wrapper of the native display, drawing calls mark the screen dirty so that
+    it is refreshed only when something was drawn.
+    """
+
+    def __init__(self, native):
+        self.native = native
+        # calls that do not draw go straight to the native display
+        self.refresh = native.refresh
+        self.text_width = native.text_width
+        self.orientation = native.orientation
+        self.backlight = native.backlight
+        self.offset = native.offset
+        self.save = native.save
+
+    def clear(self):
+        global _refresh_dirty
+        _refresh_dirty = True
+        self.native.clear()
+
+    def bar(self, *args):
+        global _refresh_dirty
+        _refresh_dirty = True
+        self.native.bar(*args)
+
+    def bar_radius(self, *args):
+        global _refresh_dirty
+        _refresh_dirty = True
+        self.native.bar_radius(*args)
+
+    def image(self, *args):
+        global _refresh_dirty
+        _refresh_dirty = True
+        self.native.image(*args)
+
+    def avatar(self, *args):
+        global _refresh_dirty
+        _refresh_dirty = True
+        self.native.avatar(*args)
+
+    def icon(self, *args):
+        global _refresh_dirty
+        _refresh_dirty = True
+        self.native.icon(*args)
+
+    def print(self, *args):
+        global _refresh_dirty
+        _refresh_dirty = True
+        self.native.print(*args)
+
+    def text(self, *args):
+        global _refresh_dirty
+        _refresh_dirty = True
+        self.native.text(*args)
+
+    def text_center(self, *args):
+        global _refresh_dirty
+        _refresh_dirty = True
+        self.native.text_center(*args)
+
+    def text_right(self, *args):
+        global _refresh_dirty
+        _refresh_dirty = True
+        self.native.text_right(*args)
+
+    def qrcode(self, *args):
+        global _refresh_dirty
+        _refresh_dirty = True
+        self.native.qrcode(*args)
+
+    def loader(self, *args):
+        global _refresh_dirty
+        _refresh_dirty = True
+        self.native.loader(*args)
+
 
 # in debug mode, display an indicator in top right corner
 if __debug__:
 
-    def debug_display_refresh():
-        display.bar(Display.WIDTH - 8, 0, 8, 8, 0xF800)
-        display.refresh()
+    def _refresh():
+        native = display.native
+        native.bar(Display.WIDTH - 8, 0, 8, 8, 0xF800)
+        native.refresh()
+
+
+else:
+
+    def _refresh():
+        display.native.refresh()
+
+
+def _refresh_after_step():
+    global _refresh_dirty, _refresh_last
+    if not _refresh_dirty:
+        return
+    now = loop.ticks_us()
+    if utime.ticks_diff(now, _refresh_last) >= _FRAME_INTERVAL_US:
+        _refresh()
+        _refresh_last = now
+        _refresh_dirty = False
+
+
+def _refresh_before_poll(delay):
+    global _refresh_dirty, _refresh_last
+    if not _refresh_dirty:
+        return
+    # keep drawing into the frame if the loop wakes up before it ends
+    now = loop.ticks_us()
+    if delay >= _FRAME_INTERVAL_US - utime.ticks_diff(now, _refresh_last):
+        _refresh()
+        _refresh_last = now
+        _refresh_dirty = False
 
-    loop.after_step_hook = debug_display_refresh
 
-# in both debug and production, emulator needs to draw the screen explicitly
-elif utils.EMULATOR:
-    loop.after_step_hook = display.refresh
+# in both debug and production, emulator needs to draw the screen explicitly,
+# drawing is tracked only there
+if __debug__ or utils.EMULATOR:
+    display = _Display(Display())
+    loop.after_step_hook = _refresh_after_step
+    loop.before_poll_hook = _refresh_before_poll
+else:
+    display = Display()
 
 # re-export constants from modtrezorui
 NORMAL = Display.FONT_NORMAL
@@ -72,7 +189,7 @@ def rotate(pos: tuple) -> tuple:
 def pulse(delay: int):
     while True:
         # normalize sin from interval -1:1 to 0:1
-        yield 0.5 + 0.5 * math.sin(utime.ticks_us() / delay)
+        yield 0.5 + 0.5 * math.sin(loop.ticks_us() / delay)
 
 
 async def alert(count: int = 3):
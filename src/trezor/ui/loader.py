@@ -1,4 +1,3 @@
-import utime
 from micropython import const
 
 from trezor import loop, res, ui
@@ -16,15 +15,15 @@ class Loader(ui.Widget):
         self.stop_ms = None
 
     def start(self):
-        self.start_ms = utime.ticks_ms()
+        self.start_ms = loop.ticks_ms()
         self.stop_ms = None
 
     def stop(self):
         if self.start_ms is not None and self.stop_ms is None:
-            diff_ms = utime.ticks_ms() - self.start_ms
+            diff_ms = loop.ticks_ms() - self.start_ms
         else:
             diff_ms = 0
-        self.stop_ms = utime.ticks_ms()
+        self.stop_ms = loop.ticks_ms()
         return diff_ms >= self.target_ms
 
     def is_active(self):
@@ -34,7 +33,7 @@ class Loader(ui.Widget):
         target = self.target_ms
         start = self.start_ms
         stop = self.stop_ms
-        now = utime.ticks_ms()
+        now = loop.ticks_ms()
         if stop is None:
             r = min(now - start, target)
         else:
@@ -1,4 +1,3 @@
-import gc
 import sys
 from trezorutils import (  # noqa: F401
     EMULATOR,
@@ -12,26 +11,33 @@ from trezorutils import (  # noqa: F401
     set_mode_unprivileged,
 )
 
+from trezor import gcpolicy
+
 
 def unimport_begin():
     return set(sys.modules)
 
 
 def unimport_end(mods):
-    for mod in sys.modules:
-        if mod not in mods:
-            # remove reference from sys.modules
-            del sys.modules[mod]
-            # remove reference from the parent module
-            i = mod.rfind(".")
-            if i < 0:
-                continue
-            path = mod[:i]
-            name = mod[i + 1 :]
-            if path in sys.modules:
-                delattr(sys.modules[path], name)
-    # collect removed modules
-    gc.collect()
+    unimport([mod for mod in sys.modules if mod not in mods])
+    # collect removed modules, if the heap needs it
+    gcpolicy.maybe_collect()
+
+
+def unimport(mods):
+    for mod in mods:
+        if mod not in sys.modules:
+            continue
+        # remove reference from sys.modules
+        del sys.modules[mod]
+        # remove reference from the parent module
+        i = mod.rfind(".")
+        if i < 0:
+            continue
+        path = mod[:i]
+        name = mod[i + 1 :]
+        if path in sys.modules:
+            delattr(sys.modules[path], name)
 
 
 def ensure(cond, msg=None):
@@ -1,9 +1,23 @@
+import gc
+import sys
+from micropython import const
+
 import protobuf
-from trezor import log, loop, messages, utils, workflow
-from trezor.wire import codec_v1
+from trezor import gcpolicy, log, loop, messages, utils, workflow
+from trezor.wire import codec_v1, codec_v2
 from trezor.wire.errors import *
 
+if __debug__:
+    import utime
+    from trezor.wire import stats
+
 workflow_handlers = {}
+workflow_concurrent = {}
+message_limits = {}
+
+# default maximum size of an incoming message, larger messages are drained
+# without allocating anything for them and rejected, see `limit`
+_MAX_MESSAGE_SIZE = const(32 * 1024)
 
 
 def add(mtype, pkgname, modname, *args):
@@ -20,15 +34,96 @@ def register(mtype, handler, *args):
     workflow_handlers[mtype] = (handler, args)
 
 
+def limit(mtype, max_size):
+    """Set maximum accepted size of `mtype` messages, overriding the default."""
+    if isinstance(mtype, type) and issubclass(mtype, protobuf.MessageType):
+        mtype = mtype.MESSAGE_WIRE_TYPE
+    message_limits[mtype] = max_size
+
+
+def concurrent(mtype, check=None):
+    """
+    Allow `mtype` workflows to run in parallel with workflows of other sessions
+    on the same interface.  Only read-only workflows that do not interact with
+    the user qualify.  If `check` is given, it is called with the received
+    message and the workflow runs in parallel only if it returns True.
+    """
+    if isinstance(mtype, type) and issubclass(mtype, protobuf.MessageType):
+        mtype = mtype.MESSAGE_WIRE_TYPE
+    workflow_concurrent[mtype] = check
+
+
+def is_concurrent(msg):
+    """Return True if the workflow handling `msg` may run in parallel."""
+    try:
+        check = workflow_concurrent[msg.MESSAGE_WIRE_TYPE]
+    except KeyError:
+        return False
+    return check is None or check(msg)
+
+
+def oversized(reader):
+    """Return True if the message opened in `reader` exceeds its size limit."""
+    return reader.size > message_limits.get(reader.type, _MAX_MESSAGE_SIZE)
+
+
 def setup(iface):
-    """Initialize the wire stack on passed USB interface."""
-    loop.schedule(session_handler(iface, codec_v1.SESSION_ID))
+    """
+    Initialize the wire stack on passed USB interface.  The legacy session is
+    started right away, sessions of the multiplexed codec are started as the
+    host opens them.
+    """
+    lock = WorkflowLock()
+    legacy = codec_v2.Session(iface, codec_v1.SESSION_ID)
+
+    def onsession(session):
+        loop.schedule(session_handler(iface, session.sid, session, lock))
+
+    loop.schedule(session_handler(iface, codec_v1.SESSION_ID, legacy, lock))
+    loop.schedule(codec_v2.handle_reports(iface, onsession, legacy))
+
+
+class WorkflowLock:
+    """
+    Lock serializing the workflows of all sessions on one interface.  Workflows
+    allowed to run in parallel (see `concurrent`) share the lock, all others
+    hold it exclusively.
+    """
+
+    def __init__(self):
+        self.shared = 0
+        self.exclusive = False
+        self.waiting = []
+
+    async def acquire(self, shared):
+        while self.exclusive or (not shared and self.shared):
+            signal = loop.signal()
+            self.waiting.append(signal)
+            await signal
+        if shared:
+            self.shared += 1
+        else:
+            self.exclusive = True
+
+    def release(self, shared):
+        if shared:
+            self.shared -= 1
+        else:
+            self.exclusive = False
+        # wake everybody up, waiters that still cannot proceed wait again
+        waiting = self.waiting
+        self.waiting = []
+        for signal in waiting:
+            signal.send(None)
 
 
 class Context:
-    def __init__(self, iface, sid):
+    def __init__(self, iface, sid, session=None, lock=None):
         self.iface = iface
         self.sid = sid
+        self.session = session  # codec_v2.Session the reports are routed to
+        self.lock = lock
+        self.writer = None
 
     async def call(self, msg, *types):
         """
@@ -58,28 +153,78 @@ class Context:
         if reader.type not in types:
             raise UnexpectedMessageError(reader)
 
+        if oversized(reader):
+            await protobuf.skip(reader, reader.size)
+            raise DataError("Message too large")
+
         # look up the protobuf class and parse the message
         pbtype = messages.get_type(reader.type)
+        if __debug__:
+            stats.record_bytes(reader.type, stats.BYTES_IN, reader.size)
+            start = utime.ticks_us()
+            msg = await protobuf.load_message(reader, pbtype)
+            stats.record_time(reader.type, stats.DECODE, start)
+            return msg
         return await protobuf.load_message(reader, pbtype)
 
+    async def read_stream(self, types, *streamed):
+        """
+        Like `self.read()`, but return a `protobuf.MessageStream` instead of
+        the loaded message.  Values of the repeated fields named in `streamed`
+        can then be processed one by one as they arrive.
+        """
+        reader = self.getreader()
+
+        if __debug__:
+            log.debug(
+                __name__,
+                "%s:%x read stream: %s",
+                self.iface.iface_num(),
+                self.sid,
+                types,
+            )
+
+        await reader.aopen()  # wait for the message header
+
+        if reader.type not in types:
+            raise UnexpectedMessageError(reader)
+
+        if oversized(reader):
+            await protobuf.skip(reader, reader.size)
+            raise DataError("Message too large")
+
+        pbtype = messages.get_type(reader.type)
+        if __debug__:
+            stats.record_bytes(reader.type, stats.BYTES_IN, reader.size)
+        return protobuf.MessageStream(reader, pbtype, streamed)
+
     async def write(self, msg):
         """
         Write a protobuf message to this wire context.
         """
-        writer = self.getwriter()
+        writer = self.getbufferedwriter()
 
         if __debug__:
             log.debug(
                 __name__, "%s:%x write: %s", self.iface.iface_num(), self.sid, msg
             )
 
-        # get the message size
-        counter = protobuf.CountingWriter()
-        await protobuf.dump_message(counter, msg)
+        if __debug__:
+            start = utime.ticks_us()
+
+        # get the message size, sizes of embedded messages are kept in `sizes`
+        # so that the message is serialized only once
+        sizes = []
+        size = protobuf.count_message(msg, sizes)
+
+        # encode the message straight into the report buffer and send it
+        writer.setheader(msg.MESSAGE_WIRE_TYPE, size)
+        protobuf.encode_message(writer, msg, sizes)
+
+        if __debug__:
+            stats.record_time(msg.MESSAGE_WIRE_TYPE, stats.ENCODE, start)
+            stats.record_bytes(msg.MESSAGE_WIRE_TYPE, stats.BYTES_OUT, size)
 
-        # write the message
-        writer.setheader(msg.MESSAGE_WIRE_TYPE, counter.size)
-        await protobuf.dump_message(writer, msg)
         await writer.aclose()
 
     def wait(self, *tasks):
@@ -91,11 +236,24 @@ class Context:
         return loop.spawn(self.read(()), *tasks)
 
     def getreader(self):
-        return codec_v1.Reader(self.iface)
+        if self.sid != codec_v1.SESSION_ID:
+            return codec_v2.Reader(self.session)
+        return codec_v1.Reader(self.iface, self.session)
 
     def getwriter(self):
+        if self.sid != codec_v1.SESSION_ID:
+            raise TypeError("Streaming writer not supported in this session")
         return codec_v1.Writer(self.iface)
 
+    def getbufferedwriter(self):
+        # the writer keeps its report buffer between messages
+        if self.writer is None:
+            if self.sid != codec_v1.SESSION_ID:
+                self.writer = codec_v2.BufferedWriter(self.iface, self.sid)
+            else:
+                self.writer = codec_v1.BufferedWriter(self.iface)
+        return self.writer
+
 
 class UnexpectedMessageError(Exception):
     def __init__(self, reader):
@@ -103,9 +261,9 @@ class UnexpectedMessageError(Exception):
         self.reader = reader
 
 
-async def session_handler(iface, sid):
+async def session_handler(iface, sid, session=None, lock=None):
     reader = None
-    ctx = Context(iface, sid)
+    ctx = Context(iface, sid, session, lock)
     while True:
         try:
             # wait for new message, if needed, and find handler
@@ -116,15 +274,17 @@ async def session_handler(iface, sid):
                 handler, args = workflow_handlers[reader.type]
             except KeyError:
                 handler, args = unexpected_msg, ()
+            if oversized(reader):
+                handler, args = oversized_msg, ()
 
-            m = utils.unimport_begin()
+            modules_begin(reader.type)
             w = handler(ctx, reader, *args)
             try:
                 workflow.onstart(w)
                 await w
             finally:
                 workflow.onclose(w)
-                utils.unimport_end(m)
+                modules_end()
 
         except UnexpectedMessageError as exc:
             # retry with opened reader from the exception
@@ -137,16 +297,104 @@ async def session_handler(iface, sid):
             # sessions are never closed by raised exceptions
             log.exception(__name__, exc)
 
+        if session is not None and session.closed:
+            # closed by the host or expired, see `codec_v2.handle_reports`
+            break
+
         # read new message in next iteration
         reader = None
 
 
+# modules imported by a workflow are kept loaded for its next run, the least
+# recently used ones are unloaded when the free heap drops under
+# `gcpolicy.MIN_FREE`
+_MAX_CACHED = const(8)  # maximum number of workflows with cached modules
+
+_running = 0  # number of running workflows, over all sessions
+_snapshot = None  # modules loaded before the first of them started
+_snapshot_type = None  # wire type of the first of them
+_cached = []  # (wire type, imported modules), in the order of loading
+_cached_lru = []  # wire types of `_cached`, least recently used first
+
+
+def modules_begin(mtype):
+    global _running, _snapshot, _snapshot_type
+    if not _running:
+        _snapshot = utils.unimport_begin()
+        _snapshot_type = mtype
+    _running += 1
+    if mtype in _cached_lru:
+        _cached_lru.remove(mtype)
+        _cached_lru.append(mtype)
+
+
+def modules_end():
+    # new modules are recorded only after the last running workflow exits, the
+    # others may still be importing
+    global _running, _snapshot
+    _running -= 1
+    if _running:
+        return
+    mods = [mod for mod in sys.modules if mod not in _snapshot]
+    _snapshot = None
+    if mods:
+        _cached.append((_snapshot_type, mods))
+        if _snapshot_type not in _cached_lru:
+            _cached_lru.append(_snapshot_type)
+    # the heap is collected first if it is low on memory, so the free heap
+    # below does not count any garbage
+    gcpolicy.maybe_collect()
+    while _cached_lru and (
+        len(_cached_lru) > _MAX_CACHED or gc.mem_free() < gcpolicy.MIN_FREE
+    ):
+        evict_modules(_cached_lru[0])
+
+
+def evict_modules(mtype):
+    """
+    Unload modules cached for `mtype` workflows.  Modules loaded later than
+    them can refer to them, so these are unloaded as well.
+    """
+    for i, (t, _) in enumerate(_cached):
+        if t == mtype:
+            break
+    else:
+        return
+    evicted = _cached[i:]
+    del _cached[i:]
+    for t, mods in evicted:
+        utils.unimport(mods)
+    for t, _ in evicted:
+        if t in _cached_lru and not any(c[0] == t for c in _cached):
+            _cached_lru.remove(t)
+    gcpolicy.collect()
+
+
 async def protobuf_workflow(ctx, reader, handler, *args):
     from trezor.messages.Failure import Failure
 
+    if __debug__:
+        mtype = reader.type
+        stats.record_bytes(mtype, stats.BYTES_IN, reader.size)
+        start = utime.ticks_us()
     req = await protobuf.load_message(reader, messages.get_type(reader.type))
+    if __debug__:
+        stats.record_time(mtype, stats.DECODE, start)
+    lock = ctx.lock
+    while lock is not None:
+        shared = is_concurrent(req)
+        await lock.acquire(shared)
+        # an exclusive workflow can change the state deciding the check, e.g.
+        # clear the seed cache, while we wait, so check again under the lock
+        if not shared or is_concurrent(req):
+            break
+        lock.release(shared)
+    if __debug__:
+        start = utime.ticks_us()
     try:
         res = await handler(ctx, req, *args)
+        if __debug__:
+            stats.record_time(mtype, stats.HANDLER, start)
     except UnexpectedMessageError:
         # session handler takes care of this one
         raise
@@ -160,6 +408,9 @@ async def protobuf_workflow(ctx, reader, handler, *args):
             Failure(code=FailureType.FirmwareError, message="Firmware error")
         )
         raise
+    finally:
+        if lock is not None:
+            lock.release(shared)
     if res:
         # respond with a specific response
         await ctx.write(res)
@@ -176,11 +427,19 @@ async def unexpected_msg(ctx, reader):
     from trezor.messages.Failure import Failure
 
     # receive the message and throw it away
-    while reader.size > 0:
-        buf = bytearray(reader.size)
-        await reader.areadinto(buf)
+    await protobuf.skip(reader, reader.size)
 
     # respond with an unknown message error
     await ctx.write(
         Failure(code=FailureType.UnexpectedMessage, message="Unexpected message")
     )
+
+
+async def oversized_msg(ctx, reader):
+    from trezor.messages.Failure import Failure
+
+    # receive the message and throw it away
+    await protobuf.skip(reader, reader.size)
+
+    # respond with a data error
+    await ctx.write(Failure(code=FailureType.DataError, message="Message too large"))
@@ -11,6 +11,11 @@ _REP_INIT = ">BBBHL"  # marker, magic, magic, wire type, data length
 _REP_INIT_DATA = const(9)  # offset of data in the initial report
 _REP_CONT_DATA = const(1)  # offset of data in the continuation report
 
+# report buffers of up to this size are kept by `BufferedWriter` for reuse
+_KEEP_BUFFER_SIZE = const(1024)
+
+_poll_entry = [0, 0]  # result of io.poll() when checking for write readiness
+
 SESSION_ID = const(0)
 
 
@@ -20,26 +25,35 @@ class Reader:
     async-file-like interface.
     """
 
-    def __init__(self, iface):
+    def __init__(self, iface, session=None):
         self.iface = iface
+        self.session = session  # codec_v2.Session the reports are routed to
         self.type = None
         self.size = None
-        self.data = None
-        self.ofs = 0
+        self.data = None  # last received report
+        self.ofs = 0  # offset of unread data in the report
+        self.end = 0  # end of message data in the report
+        self.read = loop.wait(iface.iface_num() | io.POLL_READ)
 
     def __repr__(self):
         return "<ReaderV1: type=%d size=%dB>" % (self.type, self.size)
 
+    def readreport(self):
+        # reports are read straight from the interface, unless they are
+        # routed to a session by `codec_v2.handle_reports`
+        if self.session is not None:
+            return self.session.take()
+        return self.read
+
     async def aopen(self):
         """
         Begin the message transmission by waiting for initial V2 message report
         on this session.  `self.type` and `self.size` are initialized and
         available after `aopen()` returns.
         """
-        read = loop.wait(self.iface.iface_num() | io.POLL_READ)
         while True:
             # wait for initial report
-            report = await read
+            report = await self.readreport()
             marker = report[0]
             if marker == _REP_MARKER:
                 _, m1, m2, mtype, msize = ustruct.unpack(_REP_INIT, report)
@@ -47,11 +61,12 @@ class Reader:
                     raise ValueError
                 break
 
-        # load received message header
+        # load received message header, data are read straight from the report
         self.type = mtype
         self.size = msize
-        self.data = report[_REP_INIT_DATA : _REP_INIT_DATA + msize]
-        self.ofs = 0
+        self.data = report
+        self.ofs = _REP_INIT_DATA
+        self.end = min(len(report), _REP_INIT_DATA + msize)
 
     async def areadinto(self, buf):
         """
@@ -62,22 +77,22 @@ class Reader:
         if self.size < len(buf):
             raise EOFError
 
-        read = loop.wait(self.iface.iface_num() | io.POLL_READ)
         nread = 0
         while nread < len(buf):
-            if self.ofs == len(self.data):
+            if self.ofs == self.end:
                 # we are at the end of received data
                 # wait for continuation report
                 while True:
-                    report = await read
+                    report = await self.readreport()
                     marker = report[0]
                     if marker == _REP_MARKER:
                         break
-                self.data = report[_REP_CONT_DATA : _REP_CONT_DATA + self.size]
-                self.ofs = 0
+                self.data = report
+                self.ofs = _REP_CONT_DATA
+                self.end = min(len(report), _REP_CONT_DATA + self.size)
 
             # copy as much as possible to target buffer
-            nbytes = utils.memcpy(buf, nread, self.data, self.ofs, len(buf))
+            nbytes = utils.memcpy(buf, nread, self.data, self.ofs, self.end - self.ofs)
             nread += nbytes
             self.ofs += nbytes
             self.size -= nbytes
@@ -157,3 +172,136 @@ class Writer:
                 n = self.iface.write(self.data)
                 if n == len(self.data):
                     break
+
+
+def reports_size(msize, init_data=_REP_INIT_DATA, cont_data=_REP_CONT_DATA):
+    """
+    Return the size of a buffer holding a message of `msize` bytes framed into
+    reports, including the initial report header.
+    """
+    rest = msize - (_REP_LEN - init_data)
+    if rest <= 0:
+        return _REP_LEN
+    cont = _REP_LEN - cont_data
+    return _REP_LEN * (1 + (rest + cont - 1) // cont)
+
+
+class BufferedWriter:
+    """
+    Encoder for legacy codec over the HID layer, framing the whole message into
+    reports in memory.  Provides synchronous `write` and `write_uvarint` (see
+    `protobuf.encode_message`), the reports are sent in `aclose()` straight
+    from the buffer, in bursts of as many reports as the interface accepts
+    without waiting.  The buffer is reused for the next message, if it is not
+    too large to be kept around.
+    """
+
+    init_data = _REP_INIT_DATA  # offset of data in the initial report
+    cont_data = _REP_CONT_DATA  # offset of data in the continuation report
+
+    def __init__(self, iface):
+        self.iface = iface
+        self.type = None
+        self.size = None
+        self.data = None
+        self.ofs = 0
+        self.end = 0
+        self.write_wait = loop.wait(iface.iface_num() | io.POLL_WRITE)
+        self.write_ready = (iface.iface_num() | io.POLL_WRITE,)
+
+    def __repr__(self):
+        return "<BufferedWriterV1: type=%d size=%dB>" % (self.type, self.size)
+
+    def setheader(self, mtype, msize):
+        """
+        Reset the writer state, allocate a buffer for the message if needed and
+        load the message header with passed type and total message size.
+        """
+        end = reports_size(msize, self.init_data, self.cont_data)
+        if self.data is None or len(self.data) < end:
+            self.data = bytearray(end)
+        self.type = mtype
+        self.size = msize
+        self.end = end
+        self.pack_init(mtype, msize)
+        self.ofs = self.init_data
+
+    def pack_init(self, mtype, msize):
+        """Write the header of the initial report."""
+        ustruct.pack_into(
+            _REP_INIT, self.data, 0, _REP_MARKER, _REP_MAGIC, _REP_MAGIC, mtype, msize
+        )
+
+    def pack_cont(self, ofs):
+        """Write the header of the continuation report starting at `ofs`."""
+        self.data[ofs] = _REP_MARKER
+
+    def write(self, buf):
+        """
+        Frame every byte from `buf` into the reports.  Raises `EOFError` if the
+        length of `buf` exceeds the remaining message length.
+        """
+        if self.size < len(buf):
+            raise EOFError
+
+        data = self.data
+        nwritten = 0
+        while nwritten < len(buf):
+            ofs = self.ofs
+            if ofs % _REP_LEN == 0:
+                # we are at the start of a continuation report
+                self.pack_cont(ofs)
+                ofs += self.cont_data
+            # copy as much as fits into the current report
+            rest = _REP_LEN - ofs % _REP_LEN
+            nbytes = utils.memcpy(data, ofs, buf, nwritten, rest)
+            nwritten += nbytes
+            self.ofs = ofs + nbytes
+            self.size -= nbytes
+
+        return nwritten
+
+    def write_uvarint(self, n):
+        if n < 0:
+            raise ValueError("Cannot dump signed value, convert it to unsigned first.")
+        data = self.data
+        shifted = True
+        while shifted:
+            if self.size < 1:
+                raise EOFError
+            ofs = self.ofs
+            if ofs % _REP_LEN == 0:
+                self.pack_cont(ofs)
+                ofs += self.cont_data
+            shifted = n >> 7
+            data[ofs] = (n & 0x7F) | (0x80 if shifted else 0x00)
+            self.ofs = ofs + 1
+            self.size -= 1
+            n = shifted
+
+    async def aclose(self):
+        """Pad the final report and send all reports of the message."""
+        data = self.data
+        end = self.end
+        ofs = self.ofs
+        while ofs < end:
+            data[ofs] = 0x00
+            ofs += 1
+
+        iface = self.iface
+        view = memoryview(data)
+        ofs = 0
+        while ofs < end:
+            # wait until the interface is writable, once per burst
+            await self.write_wait
+            # push reports for as long as the interface stays writable
+            while True:
+                n = iface.write(view[ofs : ofs + _REP_LEN])
+                if n != _REP_LEN:
+                    break  # report not accepted, retry after the next wait
+                ofs += _REP_LEN
+                if ofs == end or not io.poll(self.write_ready, _poll_entry, 0):
+                    break
+
+        if len(data) > _KEEP_BUFFER_SIZE:
+            self.data = None  # do not keep large buffers allocated
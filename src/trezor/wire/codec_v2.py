@@ -0,0 +1,229 @@
+import ustruct
+import utime
+from micropython import const
+
+from trezor import io, loop, utils
+from trezor.wire import codec_v1
+
+_REP_LEN = const(64)
+
+_REP_MARKER_V1 = const(63)  # ord('?'), reports of the legacy codec
+_REP_MARKER_INIT = const(33)  # ord('!')
+_REP_MARKER_CONT = const(43)  # ord('+')
+_REP_MARKER_CLOSE = const(45)  # ord('-')
+_REP_INIT = ">BLHL"  # marker, session id, wire type, data length
+_REP_CONT = ">BL"  # marker, session id, also used by the close report
+_REP_INIT_DATA = const(11)  # offset of data in the initial report
+_REP_CONT_DATA = const(5)  # offset of data in the continuation report
+
+_MAX_SESSIONS = const(4)  # maximum number of open sessions per interface
+_MAX_REPORTS = const(16)  # maximum number of reports queued per session
+_SESSION_EXPIRY = const(10000)  # ms without reports before a session can expire
+
+
+class Session:
+    """
+    Queue of reports received for one session, filled by `handle_reports` and
+    consumed by `Reader`, or by `codec_v1.Reader` for the legacy session.
+    When the reader does not keep up and the queue overflows, the queued
+    reports are dropped and the next take raises `EOFError`, other sessions
+    keep receiving.  Taking from a closed session raises `EOFError` as well.
+    """
+
+    def __init__(self, iface, sid):
+        self.iface = iface
+        self.sid = sid
+        self.reports = []
+        self.signal = loop.signal()  # sent when a report is queued
+        self.dropped = False  # reports were dropped since the last take
+        self.last = utime.ticks_ms()  # time of the last queued report
+        self.waiting = False  # True while the reader waits for a report
+        self.closed = False
+
+    def __repr__(self):
+        return "<SessionV2: sid=%x>" % self.sid
+
+    def put(self, report):
+        if len(self.reports) < _MAX_REPORTS:
+            self.reports.append(report)
+        else:
+            # the message being received is lost, let the reader know
+            self.reports = []
+            self.dropped = True
+        self.last = utime.ticks_ms()
+        self.signal.send(None)
+
+    def close(self):
+        self.closed = True
+        self.reports = []
+        self.signal.send(None)
+
+    async def take(self):
+        # the signal can be left with a value sent for an already taken
+        # report, so check the queue again after every wake-up
+        while not self.reports and not self.dropped:
+            if self.closed:
+                raise EOFError
+            self.waiting = True
+            try:
+                await self.signal
+            finally:
+                self.waiting = False
+        if self.dropped:
+            self.dropped = False
+            raise EOFError
+        return self.reports.pop(0)
+
+
+async def handle_reports(iface, onsession, legacy=None):
+    """
+    Receive reports on `iface` and route them to their sessions.  New sessions
+    are opened by an initial report with an unknown session id, `onsession` is
+    called with every new `Session`.  Sessions are closed by a close report of
+    the host, or expire when a new one does not fit, see `expire`.  Reports of
+    the legacy codec are routed to the `legacy` session, this task is the only
+    reader of the interface and never waits for a session.
+    """
+    sessions = {}
+    read = loop.wait(iface.iface_num() | io.POLL_READ)
+    while True:
+        report = await read
+        marker = report[0]
+        if marker == _REP_MARKER_V1:
+            session = legacy
+        elif len(report) < _REP_CONT_DATA:
+            continue
+        elif marker == _REP_MARKER_CLOSE:
+            _, sid = ustruct.unpack_from(_REP_CONT, report)
+            session = sessions.pop(sid, None)
+            if session is not None:
+                session.close()
+            continue
+        elif marker != _REP_MARKER_INIT and marker != _REP_MARKER_CONT:
+            continue
+        else:
+            _, sid = ustruct.unpack_from(_REP_CONT, report)
+            session = sessions.get(sid)
+            if session is None:
+                if marker != _REP_MARKER_INIT or sid == codec_v1.SESSION_ID:
+                    continue
+                if len(sessions) >= _MAX_SESSIONS and not expire(sessions):
+                    continue
+                session = sessions[sid] = Session(iface, sid)
+                onsession(session)
+        if session is not None:
+            session.put(report)
+
+
+def expire(sessions):
+    """
+    Close the session that received no report for the longest time, if its
+    reader waits for one and the last report is older than `_SESSION_EXPIRY`.
+    Sessions busy with a workflow never expire.  Return True if a session was
+    closed.
+    """
+    now = utime.ticks_ms()
+    expired = None
+    idle = _SESSION_EXPIRY
+    for session in sessions.values():
+        if session.waiting and utime.ticks_diff(now, session.last) >= idle:
+            expired = session
+            idle = utime.ticks_diff(now, session.last)
+    if expired is None:
+        return False
+    del sessions[expired.sid]
+    expired.close()
+    return True
+
+
+class Reader:
+    """
+    Decoder for session-multiplexed codec over the HID layer.  Provides
+    readable async-file-like interface.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.type = None
+        self.size = None
+        self.data = None  # last received report
+        self.ofs = 0  # offset of unread data in the report
+        self.end = 0  # end of message data in the report
+
+    def __repr__(self):
+        return "<ReaderV2: type=%d size=%dB>" % (self.type, self.size)
+
+    async def aopen(self):
+        """
+        Begin the message transmission by waiting for initial report on this
+        session.  `self.type` and `self.size` are initialized and available
+        after `aopen()` returns.
+        """
+        while True:
+            # wait for initial report, continuations of unread messages are
+            # thrown away
+            report = await self.session.take()
+            if report[0] == _REP_MARKER_INIT:
+                _, _, mtype, msize = ustruct.unpack_from(_REP_INIT, report)
+                break
+
+        self.type = mtype
+        self.size = msize
+        self.data = report
+        self.ofs = _REP_INIT_DATA
+        self.end = min(len(report), _REP_INIT_DATA + msize)
+
+    async def areadinto(self, buf):
+        """
+        Read exactly `len(buf)` bytes into `buf`, waiting for additional
+        reports, if needed.  Raises `EOFError` if end-of-message is encountered
+        before the full read can be completed.
+        """
+        if self.size < len(buf):
+            raise EOFError
+
+        nread = 0
+        while nread < len(buf):
+            if self.ofs == self.end:
+                # we are at the end of received data
+                # wait for continuation report
+                while True:
+                    report = await self.session.take()
+                    if report[0] == _REP_MARKER_CONT:
+                        break
+                self.data = report
+                self.ofs = _REP_CONT_DATA
+                self.end = min(len(report), _REP_CONT_DATA + self.size)
+
+            # copy as much as possible to target buffer
+            nbytes = utils.memcpy(buf, nread, self.data, self.ofs, self.end - self.ofs)
+            nread += nbytes
+            self.ofs += nbytes
+            self.size -= nbytes
+
+        return nread
+
+
+class BufferedWriter(codec_v1.BufferedWriter):
+    """
+    Encoder for session-multiplexed codec over the HID layer, see
+    `codec_v1.BufferedWriter`.  Every report carries the session id.
+    """
+
+    init_data = _REP_INIT_DATA
+    cont_data = _REP_CONT_DATA
+
+    def __init__(self, iface, sid):
+        super().__init__(iface)
+        self.sid = sid
+
+    def __repr__(self):
+        return "<BufferedWriterV2: type=%d size=%dB>" % (self.type, self.size)
+
+    def pack_init(self, mtype, msize):
+        ustruct.pack_into(
+            _REP_INIT, self.data, 0, _REP_MARKER_INIT, self.sid, mtype, msize
+        )
+
+    def pack_cont(self, ofs):
+        ustruct.pack_into(_REP_CONT, self.data, ofs, _REP_MARKER_CONT, self.sid)
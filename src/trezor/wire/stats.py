@@ -0,0 +1,56 @@
+"""
+Latency statistics of the wire messages, kept in debug builds only.  For every
+wire type, there are histograms of the time spent decoding the message, in
+the workflow handler and encoding the message, and the total number of bytes
+received and sent.  Read them with the `DebugLinkGetWireStats` message.
+"""
+
+import array
+import utime
+from micropython import const
+
+BUCKETS = const(12)  # number of histogram buckets
+BUCKET_BASE_US = const(128)  # upper bound of the first bucket, doubles in each
+
+DECODE = const(0)  # offset of the decode time histogram
+HANDLER = const(BUCKETS)  # offset of the handler time histogram
+ENCODE = const(2 * BUCKETS)  # offset of the encode time histogram
+BYTES_IN = const(3 * BUCKETS)
+BYTES_OUT = const(3 * BUCKETS + 1)
+_SIZE = const(3 * BUCKETS + 2)
+
+_MAX_TYPES = const(32)  # maximum number of wire types with stats
+
+stats = {}  # wire type -> array of counters, see offsets above
+
+
+def get(mtype):
+    """Return the array of counters of `mtype`, or None if there is no room."""
+    counters = stats.get(mtype)
+    if counters is None and len(stats) < _MAX_TYPES:
+        counters = stats[mtype] = array.array("I", [0] * _SIZE)
+    return counters
+
+
+def record_time(mtype, hist, start):
+    """Add the time elapsed since `start` to histogram `hist` of `mtype`."""
+    elapsed = utime.ticks_diff(utime.ticks_us(), start)
+    counters = get(mtype)
+    if counters is None:
+        return
+    bucket = 0
+    bound = BUCKET_BASE_US
+    while elapsed >= bound and bucket < BUCKETS - 1:
+        bucket += 1
+        bound <<= 1
+    counters[hist + bucket] += 1
+
+
+def record_bytes(mtype, field, nbytes):
+    counters = get(mtype)
+    if counters is not None:
+        counters[field] += nbytes
+
+
+def reset():
+    stats.clear()
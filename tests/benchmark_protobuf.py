@@ -0,0 +1,128 @@
+"""
+Benchmark of the protobuf codec over the generated wire messages.
+
+Every message registered in `trezor.messages.MessageType` is filled with
+synthetic field values, then dumped and loaded back repeatedly.  Run it on the
+unix port before and after a codec change and compare the totals:
+
+    ../build/unix/micropython -O1 benchmark_protobuf.py [iterations]
+"""
+
+import sys
+
+sys.path.append('../src')
+
+import gc
+import utime
+
+import protobuf
+from trezor import messages
+from trezor.messages import MessageType
+
+# messages on the signing hot path, reported separately
+HOT = ('TxAck', 'TxRequest', 'EthereumTxAck', 'EthereumSignTx', 'GetAddress')
+
+
+class StreamReader:
+    def __init__(self, data):
+        self.data = data
+        self.ofs = 0
+        self.size = len(data)
+
+    async def areadinto(self, buf):
+        if self.size < len(buf):
+            raise EOFError
+        nread = len(buf)
+        buf[:] = self.data[self.ofs : self.ofs + nread]
+        self.ofs += nread
+        self.size -= nread
+        return nread
+
+
+class BufferWriter:
+    def __init__(self):
+        self.data = bytearray()
+
+    async def awrite(self, buf):
+        self.data.extend(buf)
+        return len(buf)
+
+
+def run(coro):
+    try:
+        while True:
+            coro.send(None)
+    except StopIteration as e:
+        return e.value
+
+
+def sample_value(ftype, depth):
+    if ftype is protobuf.UVarintType:
+        return 0x80000000 + depth
+    if ftype is protobuf.SVarintType:
+        return -123456
+    if ftype is protobuf.BoolType:
+        return True
+    if ftype is protobuf.BytesType:
+        return bytes(range(32))
+    if ftype is protobuf.UnicodeType:
+        return 'benchmark'
+    return sample_message(ftype, depth + 1)
+
+
+def sample_message(msg_type, depth=0):
+    msg = msg_type()
+    if depth > 3:
+        return msg
+    for ftag in msg_type.FIELDS:
+        fname, ftype, fflags = msg_type.FIELDS[ftag]
+        value = sample_value(ftype, depth)
+        if fflags & protobuf.FLAG_REPEATED:
+            value = [value, value, value]
+        setattr(msg, fname, value)
+    return msg
+
+
+def measure(msg, iterations):
+    msg_type = msg.__class__
+    writer = BufferWriter()
+    run(protobuf.dump_message(writer, msg))
+    data = writer.data
+
+    start = utime.ticks_us()
+    for _ in range(iterations):
+        run(protobuf.dump_message(BufferWriter(), msg))
+    dumped = utime.ticks_diff(utime.ticks_us(), start)
+
+    start = utime.ticks_us()
+    for _ in range(iterations):
+        run(protobuf.load_message(StreamReader(data), msg_type))
+    loaded = utime.ticks_diff(utime.ticks_us(), start)
+
+    return len(data), dumped, loaded
+
+
+def main(iterations):
+    total_dump = 0
+    total_load = 0
+    count = 0
+    for name in sorted(dir(MessageType)):
+        if name.startswith('_'):
+            continue
+        try:
+            msg_type = messages.get_type(getattr(MessageType, name))
+        except (ImportError, AttributeError, KeyError):
+            continue  # message type not built into this firmware
+        gc.collect()
+        size, dumped, loaded = measure(sample_message(msg_type), iterations)
+        total_dump += dumped
+        total_load += loaded
+        count += 1
+        if name in HOT:
+            print('%-24s %5d B  dump %8d us  load %8d us' % (name, size, dumped, loaded))
+    print('%d messages x %d iterations' % (count, iterations))
+    print('total dump %d us, total load %d us' % (total_dump, total_load))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100)
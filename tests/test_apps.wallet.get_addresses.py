@@ -0,0 +1,62 @@
+from common import *
+
+from trezor import wire
+from trezor.crypto import bip32, bip39
+from trezor.messages import InputScriptType
+
+from apps.common import seed
+from apps.wallet.get_addresses import get_addresses
+from apps.wallet.messages import GetAddresses
+
+
+def run(coro):
+    try:
+        while True:
+            coro.send(None)
+    except StopIteration as e:
+        return e.value
+
+
+class TestGetAddresses(unittest.TestCase):
+
+    def setUp(self):
+        root = bip32.from_seed(bip39.seed(' '.join(['all'] * 12), ''), 'secp256k1')
+
+        async def derive_node(ctx, path, curve_name='secp256k1'):
+            node = root.clone()
+            node.derive_path(path)
+            return node
+
+        self.derive_node = seed.derive_node
+        seed.derive_node = derive_node
+
+    def tearDown(self):
+        seed.derive_node = self.derive_node
+
+    def test_get_addresses(self):
+        msg = GetAddresses(
+            address_n=[49 | 0x80000000, 1 | 0x80000000, 0 | 0x80000000, 1],
+            coin_name='Testnet',
+            script_type=InputScriptType.SPENDP2SHWITNESS,
+            count=2,
+        )
+        res = run(get_addresses(None, msg))
+        self.assertEqual(res.addresses, ['2N1LGaGg836mqSQqiuUBLfcyGBhyZbremDX', '2NFWLCJQBSpz1oUJwwLpX8ECifFWGznBVqs'])
+
+        msg.start_index = 1
+        msg.count = 1
+        res = run(get_addresses(None, msg))
+        self.assertEqual(res.addresses, ['2NFWLCJQBSpz1oUJwwLpX8ECifFWGznBVqs'])
+
+    def test_invalid_count(self):
+        for count in (None, 0, 65):
+            msg = GetAddresses(address_n=[0], count=count)
+            with self.assertRaises(wire.DataError):
+                run(get_addresses(None, msg))
+        msg = GetAddresses(address_n=[0], start_index=0xffffffff, count=2)
+        with self.assertRaises(wire.DataError):
+            run(get_addresses(None, msg))
+
+
+if __name__ == '__main__':
+    unittest.main()
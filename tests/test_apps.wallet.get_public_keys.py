@@ -0,0 +1,57 @@
+from common import *
+
+from trezor import wire
+from trezor.crypto import bip32, bip39
+
+from apps.common import coins, seed
+from apps.wallet.get_public_keys import get_public_keys
+from apps.wallet.messages import GetPublicKeys
+
+
+def run(coro):
+    try:
+        while True:
+            coro.send(None)
+    except StopIteration as e:
+        return e.value
+
+
+class TestGetPublicKeys(unittest.TestCase):
+
+    def setUp(self):
+        self.root = bip32.from_seed(bip39.seed(' '.join(['all'] * 12), ''), 'secp256k1')
+
+        async def derive_node(ctx, path, curve_name='secp256k1'):
+            node = self.root.clone()
+            node.derive_path(path)
+            return node
+
+        self.derive_node = seed.derive_node
+        seed.derive_node = derive_node
+
+    def tearDown(self):
+        seed.derive_node = self.derive_node
+
+    def test_get_public_keys(self):
+        account = [44 | 0x80000000, 0 | 0x80000000, 0 | 0x80000000]
+        msg = GetPublicKeys(address_n=account, start_index=5, count=3)
+        res = run(get_public_keys(None, msg))
+
+        # same as deriving every child from the root
+        coin = coins.by_name('Bitcoin')
+        expected = []
+        for index in range(5, 8):
+            node = self.root.clone()
+            node.derive_path(account + [index])
+            expected.append(node.serialize_public(coin.xpub_magic))
+        self.assertEqual(res.xpubs, expected)
+
+    def test_invalid_count(self):
+        for count in (None, 0, 65):
+            msg = GetPublicKeys(address_n=[0], count=count)
+            with self.assertRaises(wire.DataError):
+                run(get_public_keys(None, msg))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -78,8 +78,6 @@ class TestSignTx(unittest.TestCase):
             # ButtonRequest(code=ButtonRequest_SignTx),
             TxRequest(request_type=TXINPUT, details=TxRequestDetailsType(request_index=0, tx_hash=None), serialized=None),
             TxAck(tx=TransactionType(inputs=[inp1])),
-            TxRequest(request_type=TXOUTPUT, details=TxRequestDetailsType(request_index=0, tx_hash=None), serialized=None),
-            TxAck(tx=TransactionType(outputs=[out1])),
             TxRequest(request_type=TXOUTPUT, details=TxRequestDetailsType(request_index=0, tx_hash=None), serialized=TxRequestSerializedType(
                 signature_index=0,
                 signature=unhexlify('30450221009a0b7be0d4ed3146ee262b42202841834698bb3ee39c24e7437df208b8b7077102202b79ab1e7736219387dffe8d615bbdba87e11477104b867ef47afed1a5ede781'),
@@ -104,6 +102,316 @@ class TestSignTx(unittest.TestCase):
         with self.assertRaises(StopIteration):
             signer.send(None)
 
+    def test_two_inputs(self):
+        # input 0: 0.002 BTC, 14LmW5k4ssUrtbAB4255zdqv3b4w1TuX9e
+        # input 1: 0.003 BTC, 1CK7SJdcb8z9HuvVft3D91HLpLC6KSsGb
+
+        coin_bitcoin = coins.by_name('Bitcoin')
+
+        ptx1 = TransactionType(version=1, lock_time=0, inputs_cnt=1, outputs_cnt=2, extra_data_len=0)
+        pinp1 = TxInputType(script_sig=unhexlify('00000000'),
+                            prev_hash=unhexlify('1111111111111111111111111111111111111111111111111111111111111111'),
+                            prev_index=0,
+                            script_type=None,
+                            sequence=None)
+        pout1 = TxOutputBinType(script_pubkey=unhexlify('76a9140223b1a09138753c9cb0baf95a0a62c82711567a88ac'),
+                                amount=100000)
+        pout2 = TxOutputBinType(script_pubkey=unhexlify('76a91424a56db43cf6f2b02e838ea493f95d8d6047423188ac'),
+                                amount=200000)
+        ptx2 = TransactionType(version=1, lock_time=0, inputs_cnt=1, outputs_cnt=1, extra_data_len=0)
+        pinp2 = TxInputType(script_sig=unhexlify('00000000'),
+                            prev_hash=unhexlify('2222222222222222222222222222222222222222222222222222222222222222'),
+                            prev_index=0,
+                            script_type=None,
+                            sequence=None)
+        pout3 = TxOutputBinType(script_pubkey=unhexlify('76a9140223b1a09138753c9cb0baf95a0a62c82711567a88ac'),
+                                amount=300000)
+
+        inp1 = TxInputType(address_n=[0],  # 14LmW5k4ssUrtbAB4255zdqv3b4w1TuX9e
+                           prev_hash=unhexlify('635969907fa0fa799da48d086aa6fe794960b112e9cfc88e65b7016f6dcef2d3'),
+                           prev_index=1,
+                           amount=None,
+                           script_type=None,
+                           multisig=None,
+                           sequence=None)
+        inp2 = TxInputType(address_n=[1],  # 1CK7SJdcb8z9HuvVft3D91HLpLC6KSsGb
+                           prev_hash=unhexlify('2feb3e32fc2636ebac0d84a8305c50c58c30ef26beb933d139544cc2086a288e'),
+                           prev_index=0,
+                           amount=None,
+                           script_type=None,
+                           multisig=None,
+                           sequence=None)
+        out1 = TxOutputType(address='1MJ2tj2ThBE62zXbBYA5ZaN3fdve5CPAz1',
+                            amount=500000 - 10000,
+                            script_type=OutputScriptType.PAYTOADDRESS,
+                            address_n=[],
+                            multisig=None)
+        tx = SignTx(coin_name=None, version=None, lock_time=None, inputs_count=2, outputs_count=1)
+
+        messages = [
+            None,
+            TxRequest(request_type=TXINPUT, details=TxRequestDetailsType(request_index=0, tx_hash=None)),
+            TxAck(tx=TransactionType(inputs=[inp1])),
+            TxRequest(request_type=TXINPUT, details=TxRequestDetailsType(request_index=1, tx_hash=None), serialized=None),
+            TxAck(tx=TransactionType(inputs=[inp2])),
+            TxRequest(request_type=TXMETA, details=TxRequestDetailsType(request_index=None, tx_hash=unhexlify('635969907fa0fa799da48d086aa6fe794960b112e9cfc88e65b7016f6dcef2d3')), serialized=None),
+            TxAck(tx=ptx1),
+            TxRequest(request_type=TXINPUT, details=TxRequestDetailsType(request_index=0, tx_hash=unhexlify('635969907fa0fa799da48d086aa6fe794960b112e9cfc88e65b7016f6dcef2d3')), serialized=None),
+            TxAck(tx=TransactionType(inputs=[pinp1])),
+            TxRequest(request_type=TXOUTPUT, details=TxRequestDetailsType(request_index=0, tx_hash=unhexlify('635969907fa0fa799da48d086aa6fe794960b112e9cfc88e65b7016f6dcef2d3')), serialized=None),
+            TxAck(tx=TransactionType(bin_outputs=[pout1])),
+            TxRequest(request_type=TXOUTPUT, details=TxRequestDetailsType(request_index=1, tx_hash=unhexlify('635969907fa0fa799da48d086aa6fe794960b112e9cfc88e65b7016f6dcef2d3')), serialized=None),
+            TxAck(tx=TransactionType(bin_outputs=[pout2])),
+            TxRequest(request_type=TXMETA, details=TxRequestDetailsType(request_index=None, tx_hash=unhexlify('2feb3e32fc2636ebac0d84a8305c50c58c30ef26beb933d139544cc2086a288e')), serialized=None),
+            TxAck(tx=ptx2),
+            TxRequest(request_type=TXINPUT, details=TxRequestDetailsType(request_index=0, tx_hash=unhexlify('2feb3e32fc2636ebac0d84a8305c50c58c30ef26beb933d139544cc2086a288e')), serialized=None),
+            TxAck(tx=TransactionType(inputs=[pinp2])),
+            TxRequest(request_type=TXOUTPUT, details=TxRequestDetailsType(request_index=0, tx_hash=unhexlify('2feb3e32fc2636ebac0d84a8305c50c58c30ef26beb933d139544cc2086a288e')), serialized=None),
+            TxAck(tx=TransactionType(bin_outputs=[pout3])),
+            TxRequest(request_type=TXOUTPUT, details=TxRequestDetailsType(request_index=0, tx_hash=None), serialized=None),
+            TxAck(tx=TransactionType(outputs=[out1])),
+            signing.UiConfirmOutput(out1, coin_bitcoin),
+            True,
+            signing.UiConfirmTotal(490000 + 10000, 10000, coin_bitcoin),
+            True,
+            # the other inputs and the outputs are not streamed again for the legacy signatures
+            TxRequest(request_type=TXINPUT, details=TxRequestDetailsType(request_index=0, tx_hash=None), serialized=None),
+            TxAck(tx=TransactionType(inputs=[inp1])),
+            TxRequest(request_type=TXINPUT, details=TxRequestDetailsType(request_index=1, tx_hash=None), serialized=TxRequestSerializedType(
+                signature_index=0,
+                signature=unhexlify('3045022100bc7ff13e48c00936bb76f6b88dc536f8b6f6142ac218c28c292ab90aac156cd2022057c598d26ae08009cdbecc83d7dfb524af212cf94c36f2663108e88176b13939'),
+                serialized_tx=unhexlify('0100000002d3f2ce6d6f01b7658ec8cfe912b1604979fea66a088da49d79faa07f90695963010000006b483045022100bc7ff13e48c00936bb76f6b88dc536f8b6f6142ac218c28c292ab90aac156cd2022057c598d26ae08009cdbecc83d7dfb524af212cf94c36f2663108e88176b139390121023230848585885f63803a0a8aecdd6538792d5c539215c91698e315bf0253b43dffffffff'))),
+            TxAck(tx=TransactionType(inputs=[inp2])),
+            TxRequest(request_type=TXOUTPUT, details=TxRequestDetailsType(request_index=0, tx_hash=None), serialized=TxRequestSerializedType(
+                signature_index=1,
+                signature=unhexlify('304402207e6bb4f0ae93bc61478b9d9717e05f5ff3177f1a8a568e842bb0ed7558c7739a022041d62364980209ee7380085ce70241b368da8728aa2d0611e08d07ec6f9d7e7a'),
+                serialized_tx=unhexlify('8e286a08c24c5439d133b9be26ef308cc5505c30a8840daceb3626fc323eeb2f000000006a47304402207e6bb4f0ae93bc61478b9d9717e05f5ff3177f1a8a568e842bb0ed7558c7739a022041d62364980209ee7380085ce70241b368da8728aa2d0611e08d07ec6f9d7e7a01210338d78612e990f2eea0c426b5e48a8db70b9d7ed66282b3b26511e0b1c75515a6ffffffff'))),
+            TxAck(tx=TransactionType(outputs=[out1])),
+            TxRequest(request_type=TXFINISHED, details=None, serialized=TxRequestSerializedType(
+                signature_index=None,
+                signature=None,
+                serialized_tx=unhexlify('01107a0700000000001976a914de9b2a8da088824e8fe51debea566617d851537888ac00000000'),
+            )),
+        ]
+
+        seed = bip39.seed('alcohol woman abuse must during monitor noble actual mixed trade anger aisle', '')
+        root = bip32.from_seed(seed, 'secp256k1')
+
+        signer = signing.sign_tx(tx, root)
+
+        for request, response in chunks(messages, 2):
+            res = signer.send(request)
+            self.assertEqualEx(res, response)
+
+        with self.assertRaises(StopIteration):
+            signer.send(None)
+
+    def test_two_inputs_attack_input(self):
+        coin_bitcoin = coins.by_name('Bitcoin')
+
+        ptx1 = TransactionType(version=1, lock_time=0, inputs_cnt=1, outputs_cnt=2, extra_data_len=0)
+        pinp1 = TxInputType(script_sig=unhexlify('00000000'),
+                            prev_hash=unhexlify('1111111111111111111111111111111111111111111111111111111111111111'),
+                            prev_index=0,
+                            script_type=None,
+                            sequence=None)
+        pout1 = TxOutputBinType(script_pubkey=unhexlify('76a9140223b1a09138753c9cb0baf95a0a62c82711567a88ac'),
+                                amount=100000)
+        pout2 = TxOutputBinType(script_pubkey=unhexlify('76a91424a56db43cf6f2b02e838ea493f95d8d6047423188ac'),
+                                amount=200000)
+        ptx2 = TransactionType(version=1, lock_time=0, inputs_cnt=1, outputs_cnt=1, extra_data_len=0)
+        pinp2 = TxInputType(script_sig=unhexlify('00000000'),
+                            prev_hash=unhexlify('2222222222222222222222222222222222222222222222222222222222222222'),
+                            prev_index=0,
+                            script_type=None,
+                            sequence=None)
+        pout3 = TxOutputBinType(script_pubkey=unhexlify('76a9140223b1a09138753c9cb0baf95a0a62c82711567a88ac'),
+                                amount=300000)
+
+        inp1 = TxInputType(address_n=[0],  # 14LmW5k4ssUrtbAB4255zdqv3b4w1TuX9e
+                           prev_hash=unhexlify('635969907fa0fa799da48d086aa6fe794960b112e9cfc88e65b7016f6dcef2d3'),
+                           prev_index=1,
+                           amount=None,
+                           script_type=None,
+                           multisig=None,
+                           sequence=None)
+        inpattack = TxInputType(address_n=[0],  # 14LmW5k4ssUrtbAB4255zdqv3b4w1TuX9e
+                                prev_hash=unhexlify('635969907fa0fa799da48d086aa6fe794960b112e9cfc88e65b7016f6dcef2d3'),
+                                prev_index=0,  # modified!
+                                amount=None,
+                                script_type=None,
+                                multisig=None,
+                                sequence=None)
+        inp2 = TxInputType(address_n=[1],  # 1CK7SJdcb8z9HuvVft3D91HLpLC6KSsGb
+                           prev_hash=unhexlify('2feb3e32fc2636ebac0d84a8305c50c58c30ef26beb933d139544cc2086a288e'),
+                           prev_index=0,
+                           amount=None,
+                           script_type=None,
+                           multisig=None,
+                           sequence=None)
+        out1 = TxOutputType(address='1MJ2tj2ThBE62zXbBYA5ZaN3fdve5CPAz1',
+                            amount=500000 - 10000,
+                            script_type=OutputScriptType.PAYTOADDRESS,
+                            address_n=[],
+                            multisig=None)
+        tx = SignTx(coin_name=None, version=None, lock_time=None, inputs_count=2, outputs_count=1)
+
+        messages = [
+            None,
+            TxRequest(request_type=TXINPUT, details=TxRequestDetailsType(request_index=0, tx_hash=None)),
+            TxAck(tx=TransactionType(inputs=[inp1])),
+            TxRequest(request_type=TXINPUT, details=TxRequestDetailsType(request_index=1, tx_hash=None), serialized=None),
+            TxAck(tx=TransactionType(inputs=[inp2])),
+            TxRequest(request_type=TXMETA, details=TxRequestDetailsType(request_index=None, tx_hash=unhexlify('635969907fa0fa799da48d086aa6fe794960b112e9cfc88e65b7016f6dcef2d3')), serialized=None),
+            TxAck(tx=ptx1),
+            TxRequest(request_type=TXINPUT, details=TxRequestDetailsType(request_index=0, tx_hash=unhexlify('635969907fa0fa799da48d086aa6fe794960b112e9cfc88e65b7016f6dcef2d3')), serialized=None),
+            TxAck(tx=TransactionType(inputs=[pinp1])),
+            TxRequest(request_type=TXOUTPUT, details=TxRequestDetailsType(request_index=0, tx_hash=unhexlify('635969907fa0fa799da48d086aa6fe794960b112e9cfc88e65b7016f6dcef2d3')), serialized=None),
+            TxAck(tx=TransactionType(bin_outputs=[pout1])),
+            TxRequest(request_type=TXOUTPUT, details=TxRequestDetailsType(request_index=1, tx_hash=unhexlify('635969907fa0fa799da48d086aa6fe794960b112e9cfc88e65b7016f6dcef2d3')), serialized=None),
+            TxAck(tx=TransactionType(bin_outputs=[pout2])),
+            TxRequest(request_type=TXMETA, details=TxRequestDetailsType(request_index=None, tx_hash=unhexlify('2feb3e32fc2636ebac0d84a8305c50c58c30ef26beb933d139544cc2086a288e')), serialized=None),
+            TxAck(tx=ptx2),
+            TxRequest(request_type=TXINPUT, details=TxRequestDetailsType(request_index=0, tx_hash=unhexlify('2feb3e32fc2636ebac0d84a8305c50c58c30ef26beb933d139544cc2086a288e')), serialized=None),
+            TxAck(tx=TransactionType(inputs=[pinp2])),
+            TxRequest(request_type=TXOUTPUT, details=TxRequestDetailsType(request_index=0, tx_hash=unhexlify('2feb3e32fc2636ebac0d84a8305c50c58c30ef26beb933d139544cc2086a288e')), serialized=None),
+            TxAck(tx=TransactionType(bin_outputs=[pout3])),
+            TxRequest(request_type=TXOUTPUT, details=TxRequestDetailsType(request_index=0, tx_hash=None), serialized=None),
+            TxAck(tx=TransactionType(outputs=[out1])),
+            signing.UiConfirmOutput(out1, coin_bitcoin),
+            True,
+            signing.UiConfirmTotal(490000 + 10000, 10000, coin_bitcoin),
+            True,
+            TxRequest(request_type=TXINPUT, details=TxRequestDetailsType(request_index=0, tx_hash=None), serialized=None),
+            # the input signed in Phase 2 is not the one confirmed in Phase 1
+            TxAck(tx=TransactionType(inputs=[inpattack])),
+            TxRequest(request_type=TXINPUT, details=TxRequestDetailsType(request_index=1, tx_hash=None)),
+        ]
+
+        seed = bip39.seed('alcohol woman abuse must during monitor noble actual mixed trade anger aisle', '')
+        root = bip32.from_seed(seed, 'secp256k1')
+
+        signer = signing.sign_tx(tx, root)
+        i = 0
+        messages_count = int(len(messages) / 2)
+        for request, response in chunks(messages, 2):
+            if i == messages_count - 1:  # last message should throw SigningError
+                self.assertRaises(signing.SigningError, signer.send, request)
+            else:
+                self.assertEqualEx(signer.send(request), response)
+            i += 1
+        with self.assertRaises(StopIteration):
+            signer.send(None)
+
+    def test_two_inputs_same_prevtx(self):
+        # input 0: 0.0015 BTC, 14LmW5k4ssUrtbAB4255zdqv3b4w1TuX9e
+        # input 1: 0.0025 BTC, 1CK7SJdcb8z9HuvVft3D91HLpLC6KSsGb
+        # both spend outputs of the same previous transaction, it is streamed only once
+
+        coin_bitcoin = coins.by_name('Bitcoin')
+
+        ptx1 = TransactionType(version=1, lock_time=0, inputs_cnt=1, outputs_cnt=2, extra_data_len=0)
+        pinp1 = TxInputType(script_sig=unhexlify('00000000'),
+                            prev_hash=unhexlify('3333333333333333333333333333333333333333333333333333333333333333'),
+                            prev_index=0,
+                            script_type=None,
+                            sequence=None)
+        pout1 = TxOutputBinType(script_pubkey=unhexlify('76a91424a56db43cf6f2b02e838ea493f95d8d6047423188ac'),
+                                amount=150000)
+        pout2 = TxOutputBinType(script_pubkey=unhexlify('76a9140223b1a09138753c9cb0baf95a0a62c82711567a88ac'),
+                                amount=250000)
+
+        inp1 = TxInputType(address_n=[0],  # 14LmW5k4ssUrtbAB4255zdqv3b4w1TuX9e
+                           prev_hash=unhexlify('ebc3ea20850cac8ecef6256f5c6e36eeeb0c30bb80bf234f5724441371164797'),
+                           prev_index=0,
+                           amount=None,
+                           script_type=None,
+                           multisig=None,
+                           sequence=None)
+        inp2 = TxInputType(address_n=[1],  # 1CK7SJdcb8z9HuvVft3D91HLpLC6KSsGb
+                           prev_hash=unhexlify('ebc3ea20850cac8ecef6256f5c6e36eeeb0c30bb80bf234f5724441371164797'),
+                           prev_index=1,
+                           amount=None,
+                           script_type=None,
+                           multisig=None,
+                           sequence=None)
+        out1 = TxOutputType(address='1MJ2tj2ThBE62zXbBYA5ZaN3fdve5CPAz1',
+                            amount=400000 - 10000,
+                            script_type=OutputScriptType.PAYTOADDRESS,
+                            address_n=[],
+                            multisig=None)
+        tx = SignTx(coin_name=None, version=None, lock_time=None, inputs_count=2, outputs_count=1)
+
+        messages = [
+            None,
+            TxRequest(request_type=TXINPUT, details=TxRequestDetailsType(request_index=0, tx_hash=None)),
+            TxAck(tx=TransactionType(inputs=[inp1])),
+            TxRequest(request_type=TXINPUT, details=TxRequestDetailsType(request_index=1, tx_hash=None), serialized=None),
+            TxAck(tx=TransactionType(inputs=[inp2])),
+            TxRequest(request_type=TXMETA, details=TxRequestDetailsType(request_index=None, tx_hash=unhexlify('ebc3ea20850cac8ecef6256f5c6e36eeeb0c30bb80bf234f5724441371164797')), serialized=None),
+            TxAck(tx=ptx1),
+            TxRequest(request_type=TXINPUT, details=TxRequestDetailsType(request_index=0, tx_hash=unhexlify('ebc3ea20850cac8ecef6256f5c6e36eeeb0c30bb80bf234f5724441371164797')), serialized=None),
+            TxAck(tx=TransactionType(inputs=[pinp1])),
+            TxRequest(request_type=TXOUTPUT, details=TxRequestDetailsType(request_index=0, tx_hash=unhexlify('ebc3ea20850cac8ecef6256f5c6e36eeeb0c30bb80bf234f5724441371164797')), serialized=None),
+            TxAck(tx=TransactionType(bin_outputs=[pout1])),
+            TxRequest(request_type=TXOUTPUT, details=TxRequestDetailsType(request_index=1, tx_hash=unhexlify('ebc3ea20850cac8ecef6256f5c6e36eeeb0c30bb80bf234f5724441371164797')), serialized=None),
+            TxAck(tx=TransactionType(bin_outputs=[pout2])),
+            # no second TXMETA, the previous transaction was verified for both inputs
+            TxRequest(request_type=TXOUTPUT, details=TxRequestDetailsType(request_index=0, tx_hash=None), serialized=None),
+            TxAck(tx=TransactionType(outputs=[out1])),
+            signing.UiConfirmOutput(out1, coin_bitcoin),
+            True,
+            # both spent amounts are counted in the total and the fee
+            signing.UiConfirmTotal(390000 + 10000, 10000, coin_bitcoin),
+            True,
+            TxRequest(request_type=TXINPUT, details=TxRequestDetailsType(request_index=0, tx_hash=None), serialized=None),
+            TxAck(tx=TransactionType(inputs=[inp1])),
+            TxRequest(request_type=TXINPUT, details=TxRequestDetailsType(request_index=1, tx_hash=None), serialized=TxRequestSerializedType(
+                signature_index=0,
+                signature=unhexlify('3044022070a30b5fb8759cb3b95ef123de08263dea3994e097218d4a415b38145c212293022008e61c3acd587f5193e163254553f121d3dec39ebefe2ae481ad454e1b9ace52'),
+                serialized_tx=unhexlify('010000000297471671134424574f23bf80bb300cebee366e5c6f25f6ce8eac0c8520eac3eb000000006a473044022070a30b5fb8759cb3b95ef123de08263dea3994e097218d4a415b38145c212293022008e61c3acd587f5193e163254553f121d3dec39ebefe2ae481ad454e1b9ace520121023230848585885f63803a0a8aecdd6538792d5c539215c91698e315bf0253b43dffffffff'))),
+            TxAck(tx=TransactionType(inputs=[inp2])),
+            TxRequest(request_type=TXOUTPUT, details=TxRequestDetailsType(request_index=0, tx_hash=None), serialized=TxRequestSerializedType(
+                signature_index=1,
+                signature=unhexlify('3045022100d4b66eda95e1888da66eb02b1c6ebe756023810a9ec8811299f7f48415489fd402202c6759eea4a6905981677a55f0c9b5d70cd4c58b33ecd421ae363b818dc6549f'),
+                serialized_tx=unhexlify('97471671134424574f23bf80bb300cebee366e5c6f25f6ce8eac0c8520eac3eb010000006b483045022100d4b66eda95e1888da66eb02b1c6ebe756023810a9ec8811299f7f48415489fd402202c6759eea4a6905981677a55f0c9b5d70cd4c58b33ecd421ae363b818dc6549f01210338d78612e990f2eea0c426b5e48a8db70b9d7ed66282b3b26511e0b1c75515a6ffffffff'))),
+            TxAck(tx=TransactionType(outputs=[out1])),
+            TxRequest(request_type=TXFINISHED, details=None, serialized=TxRequestSerializedType(
+                signature_index=None,
+                signature=None,
+                serialized_tx=unhexlify('0170f30500000000001976a914de9b2a8da088824e8fe51debea566617d851537888ac00000000'),
+            )),
+        ]
+
+        seed = bip39.seed('alcohol woman abuse must during monitor noble actual mixed trade anger aisle', '')
+        root = bip32.from_seed(seed, 'secp256k1')
+
+        signer = signing.sign_tx(tx, root)
+
+        for request, response in chunks(messages, 2):
+            res = signer.send(request)
+            self.assertEqualEx(res, response)
+
+        with self.assertRaises(StopIteration):
+            signer.send(None)
+
+    def test_node_cache(self):
+        seed = bip39.seed('alcohol woman abuse must during monitor noble actual mixed trade anger aisle', '')
+        root = bip32.from_seed(seed, 'secp256k1')
+        account = [44 | 0x80000000, 0 | 0x80000000, 0 | 0x80000000]
+
+        keychain = signing.NodeCache(root, account)
+        for address_n in (account + [0, 5], account + [1, 0], account + [0, 6], [49 | 0x80000000, 0, 0]):
+            node = keychain.derive(address_n)
+            self.assertEqual(node.private_key(), signing.node_derive(root, address_n).private_key())
+        self.assertEqual([chain for chain, _ in keychain.chains], [1, 0])
+
+        # without a common account path, every key is derived from the root
+        keychain = signing.NodeCache(root, None)
+        node = keychain.derive(account + [0, 5])
+        self.assertEqual(node.private_key(), signing.node_derive(root, account + [0, 5]).private_key())
+        self.assertEqual(keychain.chains, [])
+
     def assertEqualEx(self, a, b):
         # hack to avoid adding __eq__ to signing.Ui* classes
         if ((isinstance(a, signing.UiConfirmOutput) and isinstance(b, signing.UiConfirmOutput)) or
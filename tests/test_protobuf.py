@@ -0,0 +1,257 @@
+from common import *
+
+import protobuf
+from trezor.messages.EthereumTxAck import EthereumTxAck
+from trezor.messages.Failure import Failure
+from trezor.messages.TransactionType import TransactionType
+from trezor.messages.TxAck import TxAck
+from trezor.messages.TxInputType import TxInputType
+from trezor.messages.TxOutputBinType import TxOutputBinType
+
+
+class StreamReader:
+    def __init__(self, data):
+        self.data = data
+        self.ofs = 0
+        self.size = len(data)
+
+    async def areadinto(self, buf):
+        if self.size < len(buf):
+            raise EOFError
+        nread = len(buf)
+        buf[:] = self.data[self.ofs : self.ofs + nread]
+        self.ofs += nread
+        self.size -= nread
+        return nread
+
+
+class UnsizedReader:
+    # hides the size of the message, forcing the streaming path
+
+    def __init__(self, data):
+        self.reader = StreamReader(data)
+
+    async def areadinto(self, buf):
+        return await self.reader.areadinto(buf)
+
+
+class BufferWriter:
+    def __init__(self):
+        self.data = bytearray()
+
+    async def awrite(self, buf):
+        self.data.extend(buf)
+        return len(buf)
+
+
+def run(coro):
+    try:
+        while True:
+            coro.send(None)
+    except StopIteration as e:
+        return e.value
+
+
+def dump(msg):
+    writer = BufferWriter()
+    run(protobuf.dump_message(writer, msg))
+    return writer.data
+
+
+def load(data, msg_type):
+    return run(protobuf.load_message(StreamReader(data), msg_type))
+
+
+class SlotsMessage(protobuf.MessageType):
+    FIELDS = {
+        1: ('code', protobuf.UVarintType, 0),
+        2: ('values', protobuf.SVarintType, protobuf.FLAG_REPEATED),
+        3: ('failure', Failure, 0),
+    }
+    __slots__ = ('code', 'values', 'failure')
+
+    def __init__(self, code=None, values=None, failure=None):
+        self.code = code
+        self.values = values if values is not None else []
+        self.failure = failure
+
+
+def make_tx_ack():
+    return TxAck(
+        tx=TransactionType(
+            version=2,
+            inputs=[
+                TxInputType(
+                    address_n=[44 | 0x80000000, 0x80000000, 0x80000000, 0, 5],
+                    prev_hash=unhexlify(
+                        "d5f65ee80147b4bcc70b75e4bbf2d7382021b871bd8867ef8fa525ef50864882"
+                    ),
+                    prev_index=1,
+                    sequence=0xffffffff,
+                )
+            ],
+            bin_outputs=[TxOutputBinType(amount=12300000, script_pubkey=b"\x51")],
+            lock_time=0,
+        )
+    )
+
+
+class TestProtobuf(unittest.TestCase):
+
+    def test_uvarint(self):
+        for n in (0, 1, 127, 128, 300, 0xffffffff, 0xffffffffffffffff):
+            writer = BufferWriter()
+            run(protobuf.dump_uvarint(writer, n))
+            self.assertEqual(run(protobuf.load_uvarint(StreamReader(writer.data))), n)
+
+    def test_sint(self):
+        for n in (0, -1, 1, -2, 2, -(2 ** 31), 2 ** 31 - 1):
+            self.assertEqual(protobuf.uint_to_sint(protobuf.sint_to_uint(n)), n)
+
+    def test_roundtrip(self):
+        msg = make_tx_ack()
+        data = dump(msg)
+        self.assertEqual(load(data, TxAck), msg)
+        self.assertEqual(dump(load(data, TxAck)), data)
+
+    def test_streaming(self):
+        msg = make_tx_ack()
+        data = dump(msg)
+        self.assertEqual(run(protobuf.load_message(UnsizedReader(data), TxAck)), msg)
+
+    def test_message_stream(self):
+        tx = make_tx_ack().tx
+        tx.inputs = tx.inputs * 3
+        stream = protobuf.MessageStream(UnsizedReader(dump(tx)), TransactionType, ("inputs",))
+        items = []
+        while True:
+            item = run(stream.next())
+            if item is None:
+                break
+            items.append(item)
+        self.assertEqual(items, [("inputs", tx.inputs[0])] * 3)
+        self.assertEqual(stream.msg.inputs, [])
+        self.assertEqual(stream.msg.bin_outputs, tx.bin_outputs)
+        self.assertEqual(stream.msg.version, 2)
+        self.assertEqual(stream.msg.lock_time, 0)
+
+    def test_decode_message(self):
+        msg = make_tx_ack()
+        reader = protobuf.BufferReader(dump(msg))
+        self.assertEqual(protobuf.decode_message(reader, TxAck), msg)
+        self.assertEqual(reader.ofs, reader.end)
+
+    def test_decode_truncated(self):
+        data = dump(make_tx_ack())
+        with self.assertRaises(EOFError):
+            load(data[:-1], TxAck)
+
+    def test_nocopy(self):
+        protobuf.set_nocopy(EthereumTxAck, 1)
+        protobuf.set_nocopy(TransactionType, 8)
+        self.assertEqual(EthereumTxAck.FIELDS[1][2], protobuf.FLAG_NOCOPY)
+        chunk = bytes(range(256)) * 4
+        data = dump(EthereumTxAck(data_chunk=chunk))
+        msg = load(data, EthereumTxAck)
+        self.assertIsInstance(msg.data_chunk, memoryview)
+        self.assertEqual(bytes(msg.data_chunk), chunk)
+        # streamed message gets a buffer of its own
+        msg = run(protobuf.load_message(UnsizedReader(data), EthereumTxAck))
+        self.assertEqual(bytes(msg.data_chunk), chunk)
+        # nested field in a message parsed from memory
+        tx = TransactionType(extra_data=b"\x01\x02\x03", extra_data_len=3)
+        msg = load(dump(TxAck(tx=tx)), TxAck)
+        self.assertIsInstance(msg.tx.extra_data, memoryview)
+        self.assertEqual(bytes(msg.tx.extra_data), b"\x01\x02\x03")
+
+    def test_count_message(self):
+        msg = make_tx_ack()
+        sizes = []
+        size = protobuf.count_message(msg, sizes)
+        self.assertEqual(size, len(dump(msg)))
+        # TxAck.tx, TransactionType.inputs[0], TransactionType.bin_outputs[0]
+        self.assertEqual(len(sizes), 3)
+        self.assertEqual(sizes[0], size - 2)  # key and length of tx
+
+    def test_dump_with_sizes(self):
+        msg = make_tx_ack()
+        sizes = []
+        protobuf.count_message(msg, sizes)
+        writer = BufferWriter()
+        run(protobuf.dump_message(writer, msg, sizes))
+        self.assertEqual(writer.data, dump(msg))
+
+    def test_encode_message(self):
+        for msg in (make_tx_ack(), Failure(code=3, message="☃"), Failure()):
+            data = dump(msg)
+            sizes = []
+            buf = bytearray(protobuf.count_message(msg, sizes))
+            writer = protobuf.BufferWriter(buf)
+            protobuf.encode_message(writer, msg, sizes)
+            self.assertEqual(writer.ofs, len(buf))
+            self.assertEqual(buf, data)
+        with self.assertRaises(EOFError):
+            protobuf.encode_message(protobuf.BufferWriter(bytearray(3)), make_tx_ack())
+
+    def test_unicode(self):
+        msg = Failure(code=99, message="Unexpected message ☃")
+        self.assertEqual(load(dump(msg), Failure), msg)
+
+    def test_missing_fields(self):
+        msg = load(dump(Failure(code=1)), Failure)
+        self.assertEqual(msg.code, 1)
+        self.assertEqual(msg.message, None)
+
+    def test_skip_unknown(self):
+        # field 15 (varint) and field 14 (length-delimited) are not in Failure
+        data = unhexlify("7801") + unhexlify("7203616263") + dump(Failure(code=7))
+        self.assertEqual(load(data, Failure), Failure(code=7, message=None))
+
+    def test_skip(self):
+        for n in (0, 1, 255, 256, 257, 1000):
+            reader = StreamReader(bytes(n + 1))
+            run(protobuf.skip(reader, n))
+            self.assertEqual(reader.size, 1)
+        with self.assertRaises(EOFError):
+            run(protobuf.skip(StreamReader(bytes(10)), 11))
+
+    def test_huge_length(self):
+        # Failure.message declared with a length of 2^40 bytes, must fail
+        # before anything of that size gets allocated
+        data = unhexlify("128080808080200000")
+        with self.assertRaises(EOFError):
+            load(data, Failure)
+        # same in a message too large to be parsed from memory
+        data = unhexlify("72b817") + bytes(3000) + data
+        reader = protobuf.LimitedReader(UnsizedReader(data), len(data))
+        with self.assertRaises(EOFError):
+            run(protobuf.load_message(reader, Failure))
+        # unknown field with the same length
+        with self.assertRaises(EOFError):
+            load(unhexlify("7280808080802000"), Failure)
+
+    def test_wire_type_mismatch(self):
+        # field 1 of Failure is a varint, encode it as length-delimited
+        with self.assertRaises(TypeError):
+            load(unhexlify("0a0100"), Failure)
+
+    def test_eq(self):
+        self.assertEqual(Failure(code=1), Failure(code=1, message=None))
+        self.assertNotEqual(Failure(code=1), Failure(code=2))
+        self.assertNotEqual(Failure(code=1), SlotsMessage(code=1))
+
+    def test_slots(self):
+        msg = SlotsMessage(code=3, values=[-1, 0, 1], failure=Failure(code=4))
+        data = dump(msg)
+        self.assertEqual(load(data, SlotsMessage), msg)
+        self.assertEqual(run(protobuf.load_message(UnsizedReader(data), SlotsMessage)), msg)
+
+    def test_plan_cached(self):
+        plan = protobuf.get_plan(TxInputType)
+        self.assertIs(plan, protobuf.get_plan(TxInputType))
+        self.assertIs(plan.msg_type, TxInputType)
+        self.assertIsNot(protobuf.get_plan(TxAck), plan)
+
+
+if __name__ == '__main__':
+    unittest.main()
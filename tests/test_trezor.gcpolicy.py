@@ -0,0 +1,46 @@
+from common import *
+
+import gc
+import sys
+
+import trezor
+from trezor import gcpolicy
+
+
+class TestGcPolicy(unittest.TestCase):
+
+    def test_collect(self):
+        collections = gcpolicy.collections
+        gcpolicy.collect()
+        self.assertEqual(gcpolicy.collections, collections + 1)
+        self.assertTrue(gcpolicy.collect_time >= 0)
+
+    def test_maybe_collect(self):
+        gcpolicy.collect()
+        collections = gcpolicy.collections
+        # nothing was allocated since the collection
+        if gc.mem_free() >= gcpolicy.MIN_FREE:
+            self.assertFalse(gcpolicy.maybe_collect())
+            self.assertEqual(gcpolicy.collections, collections)
+        # allocate more than the policy lets through without collecting
+        garbage = [bytearray(1024) for _ in range(32)]
+        self.assertTrue(gcpolicy.maybe_collect())
+        self.assertEqual(gcpolicy.collections, collections + 1)
+        del garbage
+
+    def test_maybe_collect_after_import(self):
+        # the allocation limit applies before the first collection as well
+        del sys.modules['trezor.gcpolicy']
+        try:
+            policy = __import__('trezor.gcpolicy', None, None, ('gcpolicy',), 0)
+            garbage = [bytearray(1024) for _ in range(32)]
+            self.assertTrue(policy.maybe_collect())
+            self.assertEqual(policy.collections, 1)
+            del garbage
+        finally:
+            sys.modules['trezor.gcpolicy'] = gcpolicy
+            trezor.gcpolicy = gcpolicy
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,212 @@
+from common import *
+
+from trezor import loop
+
+
+def run(*tasks):
+    for task in tasks:
+        loop.schedule(task)
+    loop.run()
+
+
+class TestLoop(unittest.TestCase):
+
+    def test_spawn(self):
+        log = []
+
+        async def child(name, delay):
+            try:
+                await loop.sleep(delay)
+                log.append(name)
+                return name
+            finally:
+                log.append("exit " + name)
+
+        async def parent():
+            fast = child("fast", 1000)
+            slow = child("slow", 2000)
+            waiter = loop.spawn(slow, fast)
+            result = await waiter
+            log.append(result)
+            self.assertEqual(waiter.finished, [fast])
+
+        run(parent())
+        self.assertEqual(log, ["fast", "exit fast", "exit slow", "fast"])
+
+    def test_spawn_exception(self):
+        async def failing():
+            raise ValueError
+
+        async def parent():
+            return await loop.spawn(failing(), loop.sleep(1000))
+
+        result = []
+
+        async def main():
+            try:
+                await parent()
+            except ValueError:
+                result.append(True)
+
+        run(main())
+        self.assertEqual(result, [True])
+
+    def test_close(self):
+        task = loop.wait(0x1234).__iter__()
+        loop.schedule(task)
+        loop.close(task)
+        self.assertEqual(len(loop._queue), 0)
+        loop.pause(task, 0x1234)
+        loop.close(task)
+        self.assertEqual(loop._paused[0x1234], set())
+        self.assertFalse(task in loop._paused_ifaces)
+        del loop._paused[0x1234]
+
+    def test_spawn_same_iface(self):
+        iface = 0x1234
+        log = []
+
+        class MockIO:
+            # delivers a single message once both children wait for it
+            def poll(self, paused, msg_entry, timeout):
+                if len(paused.get(iface, ())) < 2:
+                    return False
+                msg_entry[0] = iface
+                msg_entry[1] = "message"
+                return True
+
+        async def child(name):
+            log.append((name, await loop.wait(iface)))
+
+        async def parent():
+            await loop.spawn(child("a"), child("b"))
+
+        io = loop.io
+        loop.io = MockIO()
+        try:
+            run(parent())
+        finally:
+            loop.io = io
+        # the first dispatched child finishes and closes its sibling
+        self.assertEqual(len(log), 1)
+        self.assertEqual(log[0][1], "message")
+        self.assertEqual(loop._paused_ifaces, {})
+        self.assertFalse(iface in loop._paused)
+
+    def test_queue_grows(self):
+        finished = []
+
+        async def task(i):
+            finished.append(i)
+
+        run(*[task(i) for i in range(200)])
+        self.assertEqual(len(finished), 200)
+
+    def test_chan(self):
+        ch = loop.chan()
+        taken = []
+
+        async def taker():
+            for _ in range(20):
+                taken.append(await ch.take())
+
+        async def putter(i):
+            await ch.put(i)
+
+        run(*[putter(i) for i in range(20)] + [taker()])
+        self.assertEqual(taken, list(range(20)))
+
+    # profiling is available only in debug builds
+    if __debug__:
+
+        def test_profile(self):
+            async def task():
+                await loop.sleep(1000)
+
+            loop.reset_stats()
+            run(task())
+            self.assertEqual(loop.task_stats, {})
+
+            loop.profile(True)
+            try:
+                run(task(), task())
+            finally:
+                loop.profile(False)
+            # both instances of the coroutine are counted together
+            self.assertEqual(len(loop.task_stats), 1)
+            steps, step_time, max_step_time = list(loop.task_stats.values())[0]
+            self.assertEqual(steps, 4)
+            self.assertTrue(max_step_time <= step_time)
+            self.assertEqual(loop.queue_depth_max, 2)
+            loop.reset_stats()
+            self.assertEqual(loop.task_stats, {})
+
+    def test_virtual_clock(self):
+        log = []
+
+        async def sleeper(name, delay):
+            for _ in range(3):
+                await loop.sleep(delay)
+                log.append((name, loop.ticks_us()))
+
+        loop.use_virtual_clock()
+        try:
+            run(sleeper("a", 1000000), sleeper("b", 1500000))
+        finally:
+            loop.use_virtual_clock(False)
+        self.assertEqual(log, [
+            ("a", 1000000),
+            ("b", 1500000),
+            ("a", 2000000),
+            ("b", 3000000),
+            ("a", 3000000),
+            ("b", 4500000),
+        ])
+
+    def test_virtual_clock_idle(self):
+        iface = 0x1234
+        timeouts = []
+
+        class MockIO:
+            # times out twice, then delivers a message
+            def poll(self, paused, msg_entry, timeout):
+                timeouts.append(timeout)
+                if len(timeouts) < 3:
+                    return False
+                msg_entry[0] = iface
+                msg_entry[1] = "message"
+                return True
+
+        async def waiter():
+            await loop.wait(iface)
+
+        io = loop.io
+        loop.io = MockIO()
+        loop.use_virtual_clock()
+        try:
+            run(waiter())
+            now = loop.ticks_us()
+        finally:
+            loop.use_virtual_clock(False)
+            loop.io = io
+        # nothing is scheduled, the loop waits for I/O and the clock stands
+        self.assertEqual(timeouts, [0, 1000000, 1000000])
+        self.assertEqual(now, 0)
+
+    def test_fifo(self):
+        q = loop.fifo()
+        for i in range(100):
+            q.append(i)
+        for i in range(90):
+            self.assertEqual(q.popleft(), i)
+        self.assertEqual(len(q), 10)
+        self.assertTrue(len(q.items) < 100)
+        q.append(100)
+        self.assertEqual([q.popleft() for _ in range(11)], list(range(90, 101)))
+        self.assertFalse(q)
+        with self.assertRaises(IndexError):
+            q.popleft()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+from common import *
+
+import sys
+
+from trezor import messages, utils
+from trezor.messages import MessageType
+
+
+class TestMessages(unittest.TestCase):
+
+    def test_type_to_name(self):
+        # generated table is in sync with the MessageType enum
+        names = [name for name in dir(MessageType) if not name.startswith('_')]
+        self.assertEqual(len(messages.type_to_name), len(names))
+        for name in names:
+            self.assertEqual(messages.type_to_name[getattr(MessageType, name)], name)
+
+    def test_get_type(self):
+        msg_type = messages.get_type(MessageType.Failure)
+        self.assertEqual(msg_type.MESSAGE_WIRE_TYPE, MessageType.Failure)
+        self.assertIs(messages.get_type(MessageType.Failure), msg_type)
+        with self.assertRaises(KeyError):
+            messages.get_type(0xffff)
+
+    def test_get_type_unimport(self):
+        # no stale class is returned once its module is unloaded
+        msg_type = messages.get_type(MessageType.Failure)
+        utils.unimport(['trezor.messages.Failure'])
+        self.assertFalse('trezor.messages.Failure' in sys.modules)
+        reloaded = messages.get_type(MessageType.Failure)
+        self.assertIsNot(reloaded, msg_type)
+        self.assertIs(reloaded, sys.modules['trezor.messages.Failure'].Failure)
+
+
+if __name__ == '__main__':
+    unittest.main()
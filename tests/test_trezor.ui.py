@@ -0,0 +1,50 @@
+from common import *
+
+from trezor import loop, ui
+
+
+class TestUi(unittest.TestCase):
+
+    def setUp(self):
+        self.refreshes = []
+        self.orig_refresh = ui._refresh
+        ui._refresh = self.refresh
+        ui._refresh_dirty = False
+        ui._refresh_last = 0
+        loop.use_virtual_clock()
+
+    def tearDown(self):
+        loop.use_virtual_clock(False)
+        ui._refresh = self.orig_refresh
+
+    def refresh(self):
+        self.refreshes.append(loop.ticks_us())
+
+    def test_refresh_once_per_frame(self):
+        async def draw():
+            # several draws within one frame
+            for _ in range(3):
+                ui.display.bar(0, 0, 10, 10, ui.BG)
+                await loop.sleep(1000)
+            await loop.sleep(100000)
+            # draws in separate frames
+            for _ in range(2):
+                ui.display.text(0, 0, "text", ui.NORMAL, ui.FG, ui.BG)
+                await loop.sleep(100000)
+
+        loop.schedule(draw())
+        loop.run()
+        self.assertEqual(self.refreshes, [3000, 103000, 203000])
+
+    def test_refresh_idle(self):
+        async def idle():
+            for _ in range(10):
+                await loop.sleep(100000)
+
+        loop.schedule(idle())
+        loop.run()
+        self.assertEqual(self.refreshes, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,6 @@
 from common import *
 
-from trezor import utils
+from trezor import messages, utils  # noqa: F401
 
 
 class TestUtils(unittest.TestCase):
@@ -13,6 +13,16 @@ class TestUtils(unittest.TestCase):
             self.assertEqual(c[i].stop, 100 if (i == 14) else (i + 1) * 7)
             self.assertEqual(c[i].step, 1)
 
+    def test_unimport(self):
+        mods = utils.unimport_begin()
+        from trezor.messages import Failure  # noqa: F401
+        self.assertIn('trezor.messages.Failure', sys.modules)
+        utils.unimport([mod for mod in sys.modules if mod not in mods])
+        self.assertFalse('trezor.messages.Failure' in sys.modules)
+        self.assertFalse(hasattr(sys.modules['trezor.messages'], 'Failure'))
+        # modules already gone are skipped
+        utils.unimport(['trezor.messages.Failure'])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -167,5 +167,94 @@ def test_writer():
     assert_eq(writer.size, 0)
 
 
+def test_buffered_writer():
+    rep_len = 64
+    interface_num = 0xdeadbeef
+    message_type = 0x4321
+    message_len = 1024
+    interface = MockHID(interface_num)
+    writer = codec_v1.BufferedWriter(interface)
+
+    # message consisting of varints and a long payload crossing reports
+    payload = bytearray(i & 0xff for i in range(message_len - 4))
+    writer.setheader(message_type, message_len)
+    writer.write_uvarint(0x12)
+    writer.write_uvarint(300)  # two bytes
+    writer.write(payload[:100])
+    writer.write(bytearray())
+    writer.write(payload[100:])
+    writer.write_uvarint(0x7f)
+    assert_eq(writer.size, 0)
+
+    # writing past the end of the message raises eof
+    with assert_raises(EOFError):
+        writer.write(bytearray(1))
+
+    message = bytearray(unhexlify('12ac02')) + payload + bytearray(unhexlify('7f'))
+    report_header = bytearray(unhexlify('3f23234321000004' + '00'))
+    first_report = report_header + message[:rep_len - len(report_header)]
+    rest = message[rep_len - len(report_header):]
+    next_reports = [bytearray(b'?') + r for r in chunks(rest, rep_len - 1)]
+    next_reports[-1] += bytearray(rep_len - len(next_reports[-1]))
+    expected_reports = [first_report] + next_reports
+    assert_eq(len(expected_reports), codec_v1.reports_size(message_len) // rep_len)
+
+    assert_async(writer.aclose(), len(expected_reports) * [(None, wait(io.POLL_WRITE | interface_num))] + [(None, StopIteration())])
+    assert_eq(interface.data, expected_reports)
+    # large buffer is not kept around
+    assert_eq(writer.data, None)
+
+    # small messages reuse the buffer
+    expected_report = bytearray(unhexlify('3f23234321000000' + '0101')) + bytearray(rep_len - 10)
+    data = None
+    for _ in range(2):
+        interface.data.clear()
+        writer.setheader(message_type, 1)
+        writer.write_uvarint(1)
+        assert_async(writer.aclose(), [(None, wait(io.POLL_WRITE | interface_num)), (None, StopIteration())])
+        assert_eq(interface.data, [expected_report])
+        assert writer.data is not None and (data is None or writer.data is data)
+        data = writer.data
+
+
+class MockIO:
+
+    POLL_READ = io.POLL_READ
+    POLL_WRITE = io.POLL_WRITE
+
+    def __init__(self, ready):
+        self.ready = ready
+
+    def poll(self, ifaces, entry, timeout):
+        return self.ready.pop(0)
+
+
+def test_buffered_writer_burst():
+    rep_len = 64
+    interface_num = 0xdeadbeef
+    interface = MockHID(interface_num)
+    writer = codec_v1.BufferedWriter(interface)
+
+    # five reports, interface stays writable after the first two writes
+    writer.setheader(0x4321, 250)
+    writer.write(bytearray(250))
+    nreports = codec_v1.reports_size(250) // rep_len
+    assert_eq(nreports, 5)
+
+    mock_io = MockIO([True, True, False, True])
+    original_io = codec_v1.io
+    codec_v1.io = mock_io
+    try:
+        assert_async(writer.aclose(), [
+            (None, wait(io.POLL_WRITE | interface_num)),  # reports 1, 2, 3
+            (None, wait(io.POLL_WRITE | interface_num)),  # reports 4, 5
+            (None, StopIteration()),
+        ])
+    finally:
+        codec_v1.io = original_io
+    assert_eq(len(interface.data), nreports)
+    assert_eq(mock_io.ready, [])
+
+
 if __name__ == '__main__':
     run_tests()
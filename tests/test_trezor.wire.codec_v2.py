@@ -0,0 +1,231 @@
+import sys
+
+sys.path.append('../src')
+
+from utest import *
+from ubinascii import unhexlify
+import utime
+
+from trezor import io
+from trezor.loop import wait
+from trezor.utils import chunks
+from trezor.wire import codec_v2
+
+
+class MockHID:
+
+    def __init__(self, num):
+        self.num = num
+        self.data = []
+
+    def iface_num(self):
+        return self.num
+
+    def write(self, msg):
+        self.data.append(bytearray(msg))
+        return len(msg)
+
+
+def init_report(sid, mtype, payload):
+    header = bytearray(b'!') + sid.to_bytes(4, 'big') + mtype.to_bytes(2, 'big') + len(payload).to_bytes(4, 'big')
+    report = header + payload[:64 - len(header)]
+    return report + bytearray(64 - len(report))
+
+
+def cont_reports(sid, payload):
+    header = bytearray(b'+') + sid.to_bytes(4, 'big')
+    reports = [header + r for r in chunks(payload, 64 - len(header))]
+    reports[-1] += bytearray(64 - len(reports[-1]))
+    return reports
+
+
+def test_handle_reports():
+    interface_num = 0xdeadbeef
+    interface = MockHID(interface_num)
+    sessions = []
+    legacy = codec_v2.Session(interface, 0)
+    task = codec_v2.handle_reports(interface, sessions.append, legacy)
+    assert_eq_obj(task.send(None), wait(io.POLL_READ | interface_num))
+
+    # legacy report is routed to the legacy session
+    legacy_report = bytearray(unhexlify('3f23234321000000fa')) + bytearray(55)
+    task.send(legacy_report)
+    assert_eq(legacy.reports, [legacy_report])
+
+    # continuation of an unknown session is ignored
+    task.send(cont_reports(7, bytearray(10))[0])
+    assert_eq(sessions, [])
+
+    # initial report opens a session, further reports are routed to it
+    first = init_report(7, 0x4321, bytearray(100))
+    task.send(first)
+    task.send(init_report(9, 0x4321, bytearray(1)))
+    rest = cont_reports(7, bytearray(100)[53:])
+    task.send(rest[0])
+    assert_eq([s.sid for s in sessions], [7, 9])
+    assert_eq(sessions[0].reports, [first, rest[0]])
+    assert_eq(len(sessions[1].reports), 1)
+
+    # session id of the legacy codec is reserved
+    task.send(init_report(0, 0x4321, bytearray(1)))
+    assert_eq(len(sessions), 2)
+
+
+def test_handle_reports_full():
+    interface_num = 0xdeadbeef
+    interface = MockHID(interface_num)
+    sessions = []
+    task = codec_v2.handle_reports(interface, sessions.append)
+    task.send(None)
+
+    message = bytearray(1000)
+    reports = [init_report(7, 0x4321, message)] + cont_reports(7, message[53:])
+    for report in reports[:16]:
+        task.send(report)
+    task.send(init_report(9, 0x4321, bytearray(1)))
+    full, other = sessions
+
+    # overflowing queue is dropped, reading goes on for the other sessions
+    assert_eq_obj(task.send(reports[16]), wait(io.POLL_READ | interface_num))
+    assert_eq(full.reports, [])
+    assert_eq(len(other.reports), 1)
+    task.send(init_report(9, 0x4321, bytearray(1)))
+    assert_eq(len(other.reports), 2)
+
+    # reader of the overflowing session gets eof, then the reports received
+    # after the overflow
+    task.send(reports[17])
+    assert_async(full.take(), [(None, EOFError()), ])
+    assert_async(full.take(), [(None, StopIteration()), ])
+    assert_eq(full.reports, [])
+
+
+def close_report(sid):
+    return bytearray(b'-') + sid.to_bytes(4, 'big') + bytearray(59)
+
+
+def test_handle_reports_close():
+    interface_num = 0xdeadbeef
+    interface = MockHID(interface_num)
+    sessions = []
+    task = codec_v2.handle_reports(interface, sessions.append)
+    task.send(None)
+
+    task.send(init_report(7, 0x4321, bytearray(1)))
+    session = sessions[0]
+
+    # closed session is dropped, its reader gets eof
+    task.send(close_report(7))
+    assert_eq(session.closed, True)
+    assert_eq(session.reports, [])
+    assert_async(session.take(), [(None, EOFError()), ])
+
+    # further reports of the closed session are ignored, initial report opens
+    # a new session with the same id
+    task.send(cont_reports(7, bytearray(10))[0])
+    assert_eq(len(sessions), 1)
+    task.send(init_report(7, 0x4321, bytearray(1)))
+    assert_eq(len(sessions), 2)
+    assert_eq(sessions[1].closed, False)
+
+    # closing an unknown session does nothing
+    task.send(close_report(9))
+    assert_eq(sessions[1].closed, False)
+
+
+def test_handle_reports_expire():
+    interface_num = 0xdeadbeef
+    interface = MockHID(interface_num)
+    sessions = []
+    task = codec_v2.handle_reports(interface, sessions.append)
+    task.send(None)
+
+    for sid in range(1, 5):
+        task.send(init_report(sid, 0x4321, bytearray(1)))
+    assert_eq(len(sessions), 4)
+
+    # no session is idle, new session is refused
+    task.send(init_report(5, 0x4321, bytearray(1)))
+    assert_eq(len(sessions), 4)
+
+    # session waiting for a report for too long expires, others stay open
+    now = utime.ticks_ms()
+    sessions[1].waiting = True
+    sessions[1].last = utime.ticks_add(now, -10000)
+    sessions[2].waiting = True
+    sessions[2].last = utime.ticks_add(now, -20000)
+    sessions[3].last = utime.ticks_add(now, -30000)
+    task.send(init_report(5, 0x4321, bytearray(1)))
+    assert_eq([s.sid for s in sessions], [1, 2, 3, 4, 5])
+    assert_eq([s.closed for s in sessions], [False, False, True, False, False])
+
+
+def test_reader():
+    interface = MockHID(0xdeadbeef)
+    session = codec_v2.Session(interface, 0x1234)
+    reader = codec_v2.Reader(session)
+
+    message = bytearray(range(200))
+    for report in [init_report(0x1234, 0x4321, message)] + cont_reports(0x1234, message[53:]):
+        session.put(report)
+
+    assert_async(reader.aopen(), [(None, StopIteration()), ])
+    assert_eq(reader.type, 0x4321)
+    assert_eq(reader.size, len(message))
+
+    buffer = bytearray(len(message))
+    assert_async(reader.areadinto(buffer), [(None, StopIteration()), ])
+    assert_eq(buffer, message)
+    assert_eq(reader.size, 0)
+    assert_eq(session.reports, [])
+
+    # too long read, raises eof
+    assert_async(reader.areadinto(bytearray(1)), [(None, EOFError()), ])
+
+
+def test_legacy_reader():
+    interface_num = 0xdeadbeef
+    interface = MockHID(interface_num)
+    legacy = codec_v2.Session(interface, 0)
+    task = codec_v2.handle_reports(interface, lambda session: None, legacy)
+    task.send(None)
+
+    message = bytearray(range(100))
+    reports = [bytearray(unhexlify('3f23234321') + len(message).to_bytes(4, 'big')) + message[:55]]
+    reports += [bytearray(b'?') + message[55:]]
+    reports[-1] += bytearray(64 - len(reports[-1]))
+    for report in reports:
+        task.send(report)
+
+    # the legacy reader takes the routed reports, it does not read the interface
+    reader = codec_v2.codec_v1.Reader(interface, legacy)
+    assert_async(reader.aopen(), [(None, StopIteration()), ])
+    assert_eq(reader.type, 0x4321)
+    assert_eq(reader.size, len(message))
+
+    buffer = bytearray(len(message))
+    assert_async(reader.areadinto(buffer), [(None, StopIteration()), ])
+    assert_eq(buffer, message)
+    assert_eq(legacy.reports, [])
+
+
+def test_buffered_writer():
+    rep_len = 64
+    interface_num = 0xdeadbeef
+    interface = MockHID(interface_num)
+    writer = codec_v2.BufferedWriter(interface, 0x1234)
+
+    message = bytearray(i & 0xff for i in range(300))
+    writer.setheader(0x4321, len(message))
+    writer.write_uvarint(message[0])
+    writer.write(message[1:])
+    assert_eq(writer.size, 0)
+
+    expected_reports = [init_report(0x1234, 0x4321, message)] + cont_reports(0x1234, message[53:])
+    assert_eq(len(expected_reports), codec_v2.codec_v1.reports_size(len(message), 11, 5) // rep_len)
+    assert_async(writer.aclose(), len(expected_reports) * [(None, wait(io.POLL_WRITE | interface_num))] + [(None, StopIteration())])
+    assert_eq(interface.data, expected_reports)
+
+
+if __name__ == '__main__':
+    run_tests()
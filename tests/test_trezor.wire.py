@@ -0,0 +1,226 @@
+from common import *
+
+import sys
+
+import protobuf
+from trezor import gcpolicy, loop, wire
+from trezor.messages.CardanoSignTx import CardanoSignTx
+from trezor.messages.CardanoTxInputType import CardanoTxInputType
+from trezor.messages.Failure import Failure
+from trezor.wire import codec_v2
+
+
+class MockHID:
+
+    def __init__(self, num):
+        self.num = num
+
+    def iface_num(self):
+        return self.num
+
+
+def init_report(sid, mtype, payload):
+    header = bytearray(b'!') + sid.to_bytes(4, 'big') + mtype.to_bytes(2, 'big') + len(payload).to_bytes(4, 'big')
+    report = header + payload[:64 - len(header)]
+    return report + bytearray(64 - len(report))
+
+
+def cont_report(sid, payload):
+    report = bytearray(b'+') + sid.to_bytes(4, 'big') + payload[:59]
+    return report + bytearray(64 - len(report))
+
+
+def split_reports(sid, mtype, payload):
+    reports = [init_report(sid, mtype, payload)]
+    for ofs in range(53, len(payload), 59):
+        reports.append(cont_report(sid, payload[ofs:]))
+    return reports
+
+
+def make_context(mtype, payload, lock=None):
+    session = codec_v2.Session(MockHID(0xdeadbeef), 7)
+    session.put(init_report(7, mtype, payload))
+    ctx = wire.Context(session.iface, session.sid, session, lock)
+    reader = ctx.getreader()
+    run_task(reader.aopen())
+    return ctx, reader
+
+
+class MockGC:
+
+    def __init__(self, free):
+        self.free = free
+        self.collections = 0
+
+    def collect(self):
+        self.collections += 1
+
+    def mem_free(self):
+        return self.free
+
+
+class MockModule:
+    pass
+
+
+def run_workflow(mtype, mods):
+    wire.modules_begin(mtype)
+    for mod in mods:
+        sys.modules[mod] = MockModule()
+    wire.modules_end()
+
+
+def run_task(task, value=None):
+    try:
+        return task.send(value)
+    except StopIteration as e:
+        return e.value
+
+
+def run_fed(task, session, reports):
+    # queue the next report whenever the task waits for one, the whole
+    # message would not fit into the session queue
+    while True:
+        try:
+            task.send(None)
+        except StopIteration as e:
+            return e.value
+        session.put(reports.pop(0))
+
+
+class TestWire(unittest.TestCase):
+
+    def setUp(self):
+        self.gc = MockGC(gcpolicy.MIN_FREE * 2)
+        self.orig_gc = wire.gc, gcpolicy.gc
+        wire.gc = gcpolicy.gc = self.gc
+        del wire._cached[:]
+        del wire._cached_lru[:]
+
+    def tearDown(self):
+        while wire._cached_lru:
+            wire.evict_modules(wire._cached_lru[0])
+        wire.gc, gcpolicy.gc = self.orig_gc
+        for mod in list(sys.modules):
+            if mod.startswith('_test_wire_'):
+                del sys.modules[mod]
+
+    def test_modules_lru(self):
+        for mtype in range(1, 9):
+            run_workflow(mtype, ['_test_wire_%d' % mtype])
+        self.assertEqual(wire._cached_lru, list(range(1, 9)))
+
+        # run of a cached workflow makes it the most recently used one
+        run_workflow(1, [])
+        self.assertEqual(wire._cached_lru, list(range(2, 9)) + [1])
+
+        # cache is full, the least recently used modules are unloaded together
+        # with the modules loaded after them
+        run_workflow(9, ['_test_wire_9'])
+        self.assertEqual(wire._cached_lru, [1])
+        self.assertEqual([t for t, _ in wire._cached], [1])
+        self.assertTrue('_test_wire_1' in sys.modules)
+        for mtype in range(2, 10):
+            self.assertFalse('_test_wire_%d' % mtype in sys.modules)
+
+    def test_modules_low_heap(self):
+        run_workflow(1, ['_test_wire_1'])
+        run_workflow(2, ['_test_wire_2'])
+        self.assertEqual(wire._cached_lru, [1, 2])
+        collections = self.gc.collections
+
+        # heap is low after the workflow, the cached modules are unloaded
+        self.gc.free = gcpolicy.MIN_FREE - 1
+        run_workflow(3, ['_test_wire_3'])
+        self.assertEqual(wire._cached_lru, [])
+        self.assertEqual(wire._cached, [])
+        for mtype in range(1, 4):
+            self.assertFalse('_test_wire_%d' % mtype in sys.modules)
+        self.assertTrue(self.gc.collections > collections)
+
+    def test_modules_kept(self):
+        # modules loaded before the workflow are shared with the core
+        sys.modules['_test_wire_core'] = MockModule()
+        run_workflow(1, ['_test_wire_core', '_test_wire_1'])
+        self.assertEqual(wire._cached, [(1, ['_test_wire_1'])])
+
+        # nothing is unloaded while a workflow runs, even with low heap
+        wire.modules_begin(2)
+        sys.modules['_test_wire_2'] = MockModule()
+        self.gc.free = gcpolicy.MIN_FREE - 1
+        run_workflow(3, ['_test_wire_3'])
+        self.assertEqual(wire._cached, [(1, ['_test_wire_1'])])
+        for mod in ('_test_wire_1', '_test_wire_2', '_test_wire_3'):
+            self.assertTrue(mod in sys.modules)
+
+        # last workflow exits, modules of all of them are cached and unloaded
+        wire.modules_end()
+        for mod in ('_test_wire_1', '_test_wire_2', '_test_wire_3'):
+            self.assertFalse(mod in sys.modules)
+        self.assertTrue('_test_wire_core' in sys.modules)
+
+    def test_read_stream(self):
+        inputs = [
+            CardanoTxInputType(address_n=[0x80000000 | 44, 0x80000000 | 1815, i], prev_hash=bytes([i]) * 32, prev_index=i)
+            for i in range(64)
+        ]
+        msg = CardanoSignTx(inputs=inputs, transactions_count=1, network=2)
+        sizes = []
+        payload = bytearray(protobuf.count_message(msg, sizes))
+        protobuf.encode_message(protobuf.BufferWriter(payload), msg, sizes)
+        self.assertTrue(len(payload) > protobuf._BUFFERED_LIMIT)
+
+        mtype = CardanoSignTx.MESSAGE_WIRE_TYPE
+        reports = split_reports(7, mtype, payload)
+        self.assertTrue(len(reports) > codec_v2._MAX_REPORTS)
+
+        session = codec_v2.Session(MockHID(0xdeadbeef), 7)
+        ctx = wire.Context(session.iface, session.sid, session)
+        stream = run_fed(ctx.read_stream((mtype,), 'inputs'), session, reports)
+
+        for i in range(64):
+            fname, item = run_fed(stream.next(), session, reports)
+            self.assertEqual(fname, 'inputs')
+            self.assertEqual(item.address_n, inputs[i].address_n)
+            self.assertEqual(item.prev_hash, inputs[i].prev_hash)
+            self.assertEqual(item.prev_index, i)
+        self.assertIsNone(run_fed(stream.next(), session, reports))
+        self.assertEqual(reports, [])
+
+        # streamed values are not collected, the other fields are loaded
+        self.assertEqual(stream.msg.inputs, [])
+        self.assertEqual(stream.msg.outputs, [])
+        self.assertEqual(stream.msg.transactions_count, 1)
+        self.assertEqual(stream.msg.network, 2)
+
+    def test_lock_recheck(self):
+        lock = wire.WorkflowLock()
+        silent = [True]
+        log = []
+
+        async def handler(ctx, req):
+            log.append((lock.exclusive, lock.shared))
+
+        wire.concurrent(Failure, lambda msg: silent[0])
+        try:
+            ctx, reader = make_context(Failure.MESSAGE_WIRE_TYPE, b'', lock)
+            # an exclusive workflow holds the lock, the message could run
+            # in parallel when received
+            run_task(lock.acquire(False))
+            task = wire.protobuf_workflow(ctx, reader, handler)
+            self.assertIsInstance(task.send(None), loop.signal)
+
+            # the exclusive workflow changes the state before it releases the
+            # lock, the request has to take the lock exclusively then
+            silent[0] = False
+            lock.release(False)
+            with self.assertRaises(StopIteration):
+                task.send(None)
+            self.assertEqual(log, [(True, 0)])
+            self.assertEqual((lock.exclusive, lock.shared), (False, 0))
+        finally:
+            del wire.workflow_concurrent[Failure.MESSAGE_WIRE_TYPE]
+
+
+if __name__ == '__main__':
+    unittest.main()
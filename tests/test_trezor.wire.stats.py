@@ -0,0 +1,36 @@
+from common import *
+
+import utime
+
+from trezor.wire import stats
+
+
+class TestWireStats(unittest.TestCase):
+
+    def test_record_time(self):
+        stats.reset()
+        now = utime.ticks_us()
+        stats.record_time(1, stats.DECODE, now)
+        stats.record_time(1, stats.HANDLER, utime.ticks_add(now, -700))
+        stats.record_time(1, stats.ENCODE, utime.ticks_add(now, -10000000))
+        counters = stats.stats[1]
+        self.assertEqual(counters[stats.DECODE], 1)
+        # 700 us falls into the bucket of 512 to 1024 us
+        self.assertEqual(counters[stats.HANDLER + 3], 1)
+        # everything too long is counted in the last bucket
+        self.assertEqual(counters[stats.BYTES_IN - 1], 1)
+        self.assertEqual(sum(counters), 3)
+
+    def test_record_bytes(self):
+        stats.reset()
+        stats.record_bytes(2, stats.BYTES_IN, 100)
+        stats.record_bytes(2, stats.BYTES_IN, 20)
+        stats.record_bytes(2, stats.BYTES_OUT, 5)
+        self.assertEqual(stats.stats[2][stats.BYTES_IN], 120)
+        self.assertEqual(stats.stats[2][stats.BYTES_OUT], 5)
+        stats.reset()
+        self.assertEqual(stats.stats, {})
+
+
+if __name__ == '__main__':
+    unittest.main()